@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Compare records/s and payload size of the codecs serializing queue values.
+
+    $ PYTHONPATH=. python benchmarks/bench_codecs.py --records 200000
+"""
+import argparse
+import datetime
+import time
+from decimal import Decimal
+
+from porter.backends.codecs import get_codec
+
+
+def make_records(n):
+    created = datetime.datetime(2020, 1, 2, 3, 4, 5)
+    return [
+        {
+            "id": i,
+            "name": f"name {i}",
+            "price": Decimal(i) / 100,
+            "quantity": i % 97,
+            "created": created,
+            "note": "lorem ipsum dolor sit amet",
+        }
+        for i in range(n)
+    ]
+
+
+def bench(name, records, limit):
+    try:
+        codec = get_codec(name)
+    except RuntimeError as e:
+        print(f"{name:<10}{e}")
+        return
+    batches = [records[i : i + limit] for i in range(0, len(records), limit)]
+
+    start = time.perf_counter()
+    dumped = [codec.dumps_many(batch) for batch in batches]
+    encoded = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for values in dumped:
+        codec.loads_many(values)
+    decoded = time.perf_counter() - start
+
+    size = sum(len(v) for values in dumped for v in values)
+    print(
+        f"{name:<10}{len(records) / encoded:>14,.0f} dumps/s"
+        f"{len(records) / decoded:>14,.0f} loads/s{size:>14,} bytes"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=100000)
+    parser.add_argument("--limit", type=int, default=1000)
+    args = parser.parse_args()
+
+    records = make_records(args.records)
+    for name in ("json", "orjson", "msgpack"):
+        bench(name, records, args.limit)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Compare rows/s of the CSV engine used by FileReader with the former
+``line.split(delimiter)`` path.
+
+    $ PYTHONPATH=. python benchmarks/bench_csv.py --rows 500000 --columns 12
+"""
+import argparse
+import csv
+import os
+import tempfile
+import time
+
+from porter.csvstream import CsvParser, batch_read_csv
+
+
+def make_file(path, rows, columns, quoted):
+    with open(path, "w", newline="") as f_obj:
+        writer = csv.writer(f_obj, lineterminator="\n")
+        writer.writerow([f"column_{i}" for i in range(columns)])
+        for n in range(rows):
+            row = [f"value {n} {i}" for i in range(columns)]
+            if quoted and n % 10 == 0:
+                row[0] = f'quoted, "value"\nspanning lines {n}'
+            writer.writerow(row)
+
+
+def split_path(path, limit):
+    with open(path, encoding="utf8") as f_obj:
+        header = f_obj.readline().rstrip("\n").split(",")
+        return sum(
+            1
+            for line in f_obj
+            for _ in [dict(zip(header, line.rstrip("\n").split(",")))]
+        )
+
+
+def csv_path(path, limit):
+    parser = CsvParser()
+    count = 0
+    with open(path, "rb") as f_obj:
+        header = tuple(parser.parse(f_obj.readline().rstrip(b"\n")))
+        for _, _, records in batch_read_csv(limit, f_obj):
+            count += len([dict(zip(header, row)) for row in parser.parse_many(records)])
+    return count
+
+
+def bench(name, func, path, limit):
+    start = time.perf_counter()
+    rows = func(path, limit)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<24}{rows:>10} rows{rows / elapsed:>14,.0f} rows/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--columns", type=int, default=12)
+    parser.add_argument("--limit", type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        plain = os.path.join(tmp, "plain.csv")
+        quoted = os.path.join(tmp, "quoted.csv")
+        make_file(plain, args.rows, args.columns, quoted=False)
+        make_file(quoted, args.rows, args.columns, quoted=True)
+
+        bench("split, unquoted", split_path, plain, args.limit)
+        bench("csv engine, unquoted", csv_path, plain, args.limit)
+        bench("csv engine, quoted", csv_path, quoted, args.limit)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Compare records/s of the list and stream queues against a Redis server.
+
+    $ redis-server --port 6399 --save "" &
+    $ PYTHONPATH=. python benchmarks/bench_queues.py --port 6399 --records 200000
+
+The keys used are prefixed with ``porter.bench.`` and deleted afterwards.
+"""
+import argparse
+import time
+
+from porter.backends.rediscache import RedisCache
+from porter.backends.redisqueue import RedisQueue
+from porter.backends.redisstream import RedisStream
+
+KEY = "queue"
+PREFIX = "porter.bench."
+
+
+def make_records(n):
+    return [{"id": i, "name": f"name {i}", "note": "lorem ipsum"} for i in range(n)]
+
+
+def bench(name, queue, cache, records, limit):
+    queue.delete(KEY)
+    cache.delete(KEY)
+    if isinstance(queue, RedisStream):
+        queue.create_group(KEY)
+
+    start = time.perf_counter()
+    for i in range(0, len(records), limit):
+        values = queue.dump_objects(records[i : i + limit])
+        queue.push_checkpoint(KEY, values, cache, KEY, mapping={"count": i + limit})
+    pushed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    count = 0
+    while True:
+        values = queue.pop_many(KEY, limit)
+        if not values:
+            break
+        count += len(values)
+    popped = time.perf_counter() - start
+
+    queue.delete(KEY)
+    cache.delete(KEY)
+    print(
+        f"{name:<24}{len(records) / pushed:>14,.0f} pushes/s"
+        f"{count / popped:>14,.0f} pops/s{count:>10} popped"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=6379)
+    parser.add_argument("--records", type=int, default=100000)
+    parser.add_argument("--limit", type=int, default=1000)
+    args = parser.parse_args()
+
+    records = make_records(args.records)
+    options = {"host": args.host, "port": args.port, "key_prefix": PREFIX}
+    cache = RedisCache(host=args.host, port=args.port, key_prefix=PREFIX + "cache.")
+    bench("list", RedisQueue(**options), cache, records, args.limit)
+    bench("stream", RedisStream(**options), cache, records, args.limit)
+    bench(
+        "stream, trimmed",
+        RedisStream(maxlen=args.limit * 3, **options),
+        cache,
+        records,
+        args.limit,
+    )
+    bench(
+        "list, envelopes",
+        RedisQueue(envelope=True, **options),
+        cache,
+        records,
+        args.limit,
+    )
+    bench(
+        "stream, envelopes",
+        RedisStream(envelope=True, **options),
+        cache,
+        records,
+        args.limit,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Compare the per-record cost of the transform stage to the former
+per-reader ``filter`` and ``append`` generators.
+
+    $ PYTHONPATH=. python benchmarks/bench_transform.py --records 200000
+"""
+import argparse
+import time
+
+from porter.transform import Transform
+
+APPENDICES = ["source:bench", "region:eu", "tier:gold"]
+
+
+def make_records(n, width):
+    return [
+        {f"col_{j}": (i if j % 2 else f"value {i}") for j in range(width)}
+        for i in range(n)
+    ]
+
+
+def legacy(records, columns):
+    """The filter and append generators the readers used to run."""
+
+    def filter(values):
+        if not columns:
+            return values
+        kept = set(columns)
+        return ({k: v for k, v in val.items() if k in kept} for val in values)
+
+    def append(values):
+        for v in values:
+            v["porter_db"] = "db"
+            v["porter_table"] = "table"
+            for a in APPENDICES:
+                key, val = a.split(":")
+                v[key] = val
+            yield v
+
+    return list(append(filter(records)))
+
+
+def bench(name, records, limit, func):
+    batches = [records[i : i + limit] for i in range(0, len(records), limit)]
+    # the transforms modify records in place, give each run its own copies
+    batches = [[dict(r) for r in batch] for batch in batches]
+    start = time.perf_counter()
+    for batch in batches:
+        func(batch)
+    elapsed = time.perf_counter() - start
+    print(
+        f"{name:<32}{len(records) / elapsed:>14,.0f} records/s"
+        f"{elapsed / len(records) * 1e9:>10,.0f} ns/record"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=100000)
+    parser.add_argument("--width", type=int, default=20)
+    parser.add_argument("--limit", type=int, default=1000)
+    args = parser.parse_args()
+
+    records = make_records(args.records, args.width)
+    columns = [f"col_{j}" for j in range(0, args.width, 2)]
+    constants = {"porter_db": "db", "porter_table": "table"}
+    config = {"appendices": APPENDICES}
+    appendices = Transform.from_config(config, constants)
+    projection = Transform.from_config(dict(config, column=columns), constants)
+
+    bench("legacy appendices", records, args.limit, lambda b: legacy(b, None))
+    bench("transform appendices", records, args.limit, appendices)
+    bench("legacy projection", records, args.limit, lambda b: legacy(b, columns))
+    bench("transform projection", records, args.limit, projection)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,12 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
-import json
-
 try:
     import cPickle as pickle
 except ImportError:  # pragma: no cover
     import pickle
 
-from bson import json_util
+from porter.backends.codecs import get_codec
+from porter.backends.connection import get_pool
 
 
 def iteritems_wrapper(mappingorseq):
@@ -34,8 +33,12 @@ class RedisBase:
     :param password: password authentication for the Redis server.
     :param db: db (zero-based numeric index) on Redis Server to connect.
     :param key_prefix: A prefix that should be added to all keys.
+    :param codec: name of the :mod:`porter.backends.codecs` codec values are
+                  serialized with, or a :class:`Codec` instance.
 
-    Any additional keyword arguments will be passed to ``redis.Redis``.
+    Any additional keyword arguments will be passed to
+    :func:`porter.backends.connection.get_pool`, the instances connecting to
+    the same endpoint with the same options sharing a connection pool.
     """
 
     def __init__(
@@ -45,6 +48,7 @@ class RedisBase:
         password=None,
         db=0,
         key_prefix=None,
+        codec=None,
         **kwargs
     ):
         if host is None:
@@ -56,14 +60,14 @@ class RedisBase:
                 raise RuntimeError("no redis module found")
             if kwargs.get("decode_responses", None):
                 raise ValueError("decode_responses is not supported by " "RedisCache.")
-            client = redis.Redis(
-                host=host, port=port, password=password, db=db, **kwargs
-            )
+            pool = get_pool(host=host, port=port, password=password, db=db, **kwargs)
+            client = redis.Redis(connection_pool=pool)
         else:
             client = host
 
         self._write_client = self._read_client = client
         self.key_prefix = key_prefix or ""
+        self.codec = get_codec(codec)
 
     def _get_prefix(self):
         return (
@@ -71,10 +75,14 @@ class RedisBase:
         )
 
     def dump_object(self, value):
-        """Dumps an object into a string for redis.  By default it serializes
-        integers as regular string and json dumps everything else.
+        """Dumps an object into a string for redis, with the codec of the
+        instance.
         """
-        return json.dumps(value, ensure_ascii=False, default=json_util.default)
+        return self.codec.dumps(value)
+
+    def dump_objects(self, values):
+        """Dump a whole batch of values at once."""
+        return self.codec.dumps_many(values)
 
     def load_object(self, value):
         """The reversal of :meth:`dump_object`.  This might be called with
@@ -82,7 +90,15 @@ class RedisBase:
         """
         if value is None:
             return None
-        return json.loads(value)
+        return self.codec.loads(value)
+
+    def load_objects(self, values):
+        """Load a whole batch of values dumped by :meth:`dump_object` in a
+        single pass.
+        """
+        if not values:
+            return []
+        return self.codec.loads_many(values)
 
     def exists(self, key):
         return self._read_client.exists(self._get_prefix() + key)
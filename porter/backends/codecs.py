@@ -0,0 +1,293 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Serialization of the values stored in Redis.
+
+A codec encodes values into bytes and back, a whole batch at a time. The
+types coming out of MySQL and MongoDB that the formats lack are given
+explicit hooks, revived by the decoders:
+
+- ``Decimal``: ``{"$numberDecimal": str}`` in JSON, ext type 1 in msgpack;
+- ``datetime``: ``{"$date": isoformat}`` in JSON, ext type 2 in msgpack;
+- ``bytes``: ``{"$binary": {"base64": ..., "subType": "00"}}`` in JSON, bin
+  in msgpack;
+- ``ObjectId``: ``{"$oid": hex}`` in JSON, ext type 3 in msgpack.
+
+The JSON forms are MongoDB extended JSON, which ``bson.json_util.loads``
+reads as well. Dates and times without a date are encoded as plain ISO 8601
+strings.
+"""
+import base64
+import datetime
+import json
+from decimal import Decimal
+
+from bson import ObjectId, json_util
+
+EXT_DECIMAL = 1
+EXT_DATETIME = 2
+EXT_OBJECTID = 3
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return {"$numberDecimal": str(value)}
+    if isinstance(value, datetime.datetime):
+        return {"$date": value.isoformat()}
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, bytes):
+        data = base64.b64encode(value).decode("ascii")
+        return {"$binary": {"base64": data, "subType": "00"}}
+    if isinstance(value, ObjectId):
+        return {"$oid": str(value)}
+    return json_util.default(value)
+
+
+def _has_extended(data):
+    """Whether the JSON document ``data`` may hold extended JSON objects."""
+    return (b'"$' if isinstance(data, bytes) else '"$') in data
+
+
+def _json_dumps_rows(codec, names, rows, extra):
+    """Encode tuple rows with a JSON ``codec``, the ``extra`` fields encoded
+    once and spliced before the closing brace of every record.
+    """
+    if not extra or not names:
+        return Codec.dumps_rows(codec, names, rows, extra)
+    suffix = b"," + codec.dumps(extra)[1:]
+    records = codec.dumps_many(dict(zip(names, row)) for row in rows)
+    return [record[:-1] + suffix for record in records]
+
+
+def _object_hook(obj):
+    """Turn the extended JSON objects of :func:`_json_default` back into the
+    values they stand for.
+    """
+    if len(obj) == 1:
+        key, item = next(iter(obj.items()))
+        if key == "$numberDecimal":
+            return Decimal(item)
+        if key == "$date" and isinstance(item, str):
+            return datetime.datetime.fromisoformat(item.replace("Z", "+00:00"))
+        if key == "$binary" and isinstance(item, dict):
+            return base64.b64decode(item["base64"])
+        if key == "$oid":
+            return ObjectId(item)
+    return obj
+
+
+class Codec:
+    """Encode values into bytes for Redis and decode them back."""
+
+    name = None
+
+    def dumps(self, value):
+        raise NotImplementedError
+
+    def loads(self, data):
+        raise NotImplementedError
+
+    def dumps_many(self, values):
+        """Encode a batch of values into a list of elements."""
+        dumps = self.dumps
+        return [dumps(value) for value in values]
+
+    def dumps_rows(self, names, rows, extra=None):
+        """Encode tuple ``rows`` as records of the fields ``names``, unique,
+        followed by the constant fields ``extra``.
+        """
+        extra = extra or {}
+        return self.dumps_many(dict(zip(names, row), **extra) for row in rows)
+
+    def join(self, values):
+        """Join elements encoded by :meth:`dumps_many` into one document."""
+        raise NotImplementedError
+
+    def split(self, data):
+        """Decode a document made by :meth:`join` into the list of values."""
+        raise NotImplementedError
+
+    def loads_many(self, values):
+        """Decode a batch of elements encoded by :meth:`dumps_many`."""
+        if not values:
+            return []
+        return self.split(self.join(values))
+
+
+class JsonCodec(Codec):
+    """The standard library JSON encoder, the default."""
+
+    name = "json"
+
+    def __init__(self):
+        # a single encoder, instead of one per json.dumps call
+        self._encode = json.JSONEncoder(
+            ensure_ascii=False, default=_json_default
+        ).encode
+
+    def dumps(self, value):
+        return self._encode(value).encode("utf8")
+
+    def dumps_many(self, values):
+        encode = self._encode
+        return [encode(value).encode("utf8") for value in values]
+
+    def dumps_rows(self, names, rows, extra=None):
+        return _json_dumps_rows(self, names, rows, extra)
+
+    def loads(self, data):
+        return json.loads(data, object_hook=_object_hook)
+
+    def join(self, values):
+        return b"[" + b",".join(values) + b"]"
+
+    def split(self, data):
+        return self.loads(data)
+
+
+class OrjsonCodec(Codec):
+    """JSON through orjson, the same documents as :class:`JsonCodec`."""
+
+    name = "orjson"
+
+    def __init__(self):
+        try:
+            import orjson
+        except ImportError:
+            raise RuntimeError("no orjson module found")
+        self._orjson = orjson
+        self._option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def dumps(self, value):
+        return self._orjson.dumps(value, default=_json_default, option=self._option)
+
+    def dumps_many(self, values):
+        dumps, option = self._orjson.dumps, self._option
+        return [dumps(value, default=_json_default, option=option) for value in values]
+
+    def dumps_rows(self, names, rows, extra=None):
+        return _json_dumps_rows(self, names, rows, extra)
+
+    def loads(self, data):
+        # orjson has no object hook, leave the documents needing one to json
+        if _has_extended(data):
+            return json.loads(data, object_hook=_object_hook)
+        return self._orjson.loads(data)
+
+    def join(self, values):
+        return b"[" + b",".join(values) + b"]"
+
+    def split(self, data):
+        return self.loads(data)
+
+
+def _msgpack_default(value):
+    import msgpack
+
+    if isinstance(value, Decimal):
+        return msgpack.ExtType(EXT_DECIMAL, str(value).encode("ascii"))
+    if isinstance(value, datetime.datetime):
+        return msgpack.ExtType(EXT_DATETIME, value.isoformat().encode("ascii"))
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, ObjectId):
+        return msgpack.ExtType(EXT_OBJECTID, value.binary)
+    raise TypeError(f"{value!r} is not MessagePack serializable")
+
+
+def _msgpack_ext_hook(code, data):
+    import msgpack
+
+    if code == EXT_DECIMAL:
+        return Decimal(data.decode("ascii"))
+    if code == EXT_DATETIME:
+        return datetime.datetime.fromisoformat(data.decode("ascii"))
+    if code == EXT_OBJECTID:
+        return ObjectId(data)
+    return msgpack.ExtType(code, data)
+
+
+class MsgpackCodec(Codec):
+    """MessagePack, more compact than JSON and faster to decode."""
+
+    name = "msgpack"
+
+    def __init__(self):
+        try:
+            import msgpack
+        except ImportError:
+            raise RuntimeError("no msgpack module found")
+        self._msgpack = msgpack
+        self._packer = msgpack.Packer(default=_msgpack_default, use_bin_type=True)
+
+    def dumps(self, value):
+        return self._packer.pack(value)
+
+    def dumps_many(self, values):
+        pack = self._packer.pack
+        return [pack(value) for value in values]
+
+    def dumps_rows(self, names, rows, extra=None):
+        if not extra:
+            return super().dumps_rows(names, rows)
+        # the extra pairs are packed once, the map headers widened to them
+        pack = self._packer.pack
+        pairs = b"".join(pack(key) + pack(value) for key, value in extra.items())
+        header = self._packer.pack_map_header(len(names) + len(extra))
+        skip = len(self._packer.pack_map_header(len(names)))
+        records = self.dumps_many(dict(zip(names, row)) for row in rows)
+        return [header + record[skip:] + pairs for record in records]
+
+    def loads(self, data):
+        return self._msgpack.unpackb(
+            data, raw=False, strict_map_key=False, ext_hook=_msgpack_ext_hook
+        )
+
+    def join(self, values):
+        return self._packer.pack_array_header(len(values)) + b"".join(values)
+
+    def split(self, data):
+        return self.loads(data)
+
+
+class RawCodec(Codec):
+    """Lines of text pushed as they are, such as the lines of files without
+    header.
+    """
+
+    name = "raw"
+
+    def dumps(self, value):
+        return value if isinstance(value, bytes) else str(value).encode("utf8")
+
+    def loads(self, data):
+        return data
+
+    def join(self, values):
+        return b"\n".join(values)
+
+    def split(self, data):
+        return data.split(b"\n")
+
+
+CODECS = {
+    codec.name: codec for codec in (JsonCodec, OrjsonCodec, MsgpackCodec, RawCodec)
+}
+
+
+def register_codec(codec):
+    """Make the :class:`Codec` subclass ``codec`` selectable by its name."""
+    CODECS[codec.name] = codec
+    return codec
+
+
+def get_codec(codec=None):
+    """Return an instance of the codec named ``codec``, JSON by default.
+    A :class:`Codec` instance is returned as is.
+    """
+    if isinstance(codec, Codec):
+        return codec
+    try:
+        return CODECS[codec or "json"]()
+    except KeyError:
+        raise ValueError(f"unknown codec: {codec}")
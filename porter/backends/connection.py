@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Connection pools shared by all the Redis backends of a process.
+
+Backends connecting to the same endpoint with the same options share one
+``redis.ConnectionPool``, whatever task they belong to. The hiredis parser
+is used by the pools whenever the ``hiredis`` package is installed.
+"""
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+_pools = {}
+_lock = threading.Lock()
+
+
+def get_pool(
+    host="localhost",
+    port=6379,
+    password=None,
+    db=0,
+    unix_socket_path=None,
+    socket_keepalive=False,
+    socket_timeout=None,
+    socket_connect_timeout=None,
+    max_connections=None,
+    **kwargs,
+):
+    """Return the connection pool of an endpoint, created on first use.
+
+    :param host: address of the Redis server.
+    :param port: port number on which Redis server listens for connections.
+    :param password: password authentication for the Redis server.
+    :param db: db (zero-based numeric index) on Redis Server to connect.
+    :param unix_socket_path: path of a unix socket to connect through instead
+                             of ``host`` and ``port``.
+    :param socket_keepalive: whether to enable TCP keepalive.
+    :param socket_timeout: timeout of the commands, in seconds.
+    :param socket_connect_timeout: timeout of the connections, in seconds.
+    :param max_connections: maximum number of connections of the pool.
+
+    Any additional keyword arguments will be passed to the connections.
+    """
+    try:
+        import redis
+    except ImportError:
+        raise RuntimeError("no redis module found")
+
+    options = dict(kwargs, password=password, db=db, socket_timeout=socket_timeout)
+    if unix_socket_path:
+        options.update(
+            connection_class=redis.UnixDomainSocketConnection, path=unix_socket_path
+        )
+    else:
+        options.update(
+            host=host,
+            port=port,
+            socket_keepalive=socket_keepalive,
+            socket_connect_timeout=socket_connect_timeout,
+        )
+    key = (tuple(sorted(options.items(), key=lambda item: item[0])), max_connections)
+    with _lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = redis.ConnectionPool(max_connections=max_connections, **options)
+            _pools[key] = pool
+            logger.debug(f"connection pool created for {endpoint(pool)}")
+    return pool
+
+
+def endpoint(pool):
+    kwargs = pool.connection_kwargs
+    if "path" in kwargs:
+        return f"unix://{kwargs['path']}?db={kwargs.get('db', 0)}"
+    return f"redis://{kwargs.get('host')}:{kwargs.get('port')}/{kwargs.get('db', 0)}"
+
+
+def pool_stats():
+    """Return the utilization of the connection pools of the process: the
+    connections created, in use and idle, and the maximum allowed.
+    """
+    with _lock:
+        pools = list(_pools.values())
+    stats = []
+    for pool in pools:
+        in_use = len(getattr(pool, "_in_use_connections", ()))
+        available = len(getattr(pool, "_available_connections", ()))
+        stats.append(
+            {
+                "endpoint": endpoint(pool),
+                "created": in_use + available,
+                "in_use": in_use,
+                "available": available,
+                "max_connections": pool.max_connections,
+            }
+        )
+    return stats
+
+
+def close_pools():
+    """Disconnect and forget all the pools."""
+    with _lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.disconnect()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Envelopes packing a batch of queue values into a single list element.
+
+An envelope starts with :data:`MAGIC`, followed by a JSON header on one line
+and the payload: the values joined by their codec into one document,
+compressed if asked to::
+
+    \\xc1PE{"version": 1, "codec": "json", "compression": "zlib", "count": 1000}
+    <payload>
+
+The magic byte ``\\xc1`` is neither valid UTF-8 nor used by MessagePack, so
+envelopes can be told apart from plain values of any codec.
+"""
+import json
+
+from porter.backends.codecs import get_codec
+
+MAGIC = b"\xc1PE"
+VERSION = 1
+
+
+def _zlib():
+    import zlib
+
+    return zlib.compress, zlib.decompress
+
+
+def _lz4():
+    try:
+        import lz4.frame
+    except ImportError:
+        raise RuntimeError("no lz4 module found")
+    return lz4.frame.compress, lz4.frame.decompress
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        raise RuntimeError("no zstandard module found")
+    return zstandard.ZstdCompressor().compress, zstandard.ZstdDecompressor().decompress
+
+
+COMPRESSIONS = {"zlib": _zlib, "lz4": _lz4, "zstd": _zstd}
+
+
+def get_compression(name):
+    """Return the ``(compress, decompress)`` functions of a compression."""
+    try:
+        return COMPRESSIONS[name]()
+    except KeyError:
+        raise ValueError(f"unknown compression: {name}")
+
+
+def is_envelope(data):
+    return data[:3] == MAGIC
+
+
+class Envelope:
+    """Pack elements encoded by ``codec`` into envelopes of at most
+    ``records`` values, a whole batch per envelope if ``None``.
+
+    :param codec: :class:`Codec` the values are encoded with.
+    :param records: maximum number of values per envelope.
+    :param compression: ``zlib``, ``lz4``, ``zstd`` or ``None``.
+    """
+
+    def __init__(self, codec, records=None, compression=None):
+        self.codec = get_codec(codec)
+        self.records = records
+        self.compression = compression
+        self._compress = get_compression(compression)[0] if compression else None
+        # decoders of the envelopes read, by codec and compression
+        self._codecs = {self.codec.name: self.codec}
+        self._decompress = {}
+
+    def pack(self, values):
+        """Return the envelopes holding the encoded ``values``."""
+        values = values if isinstance(values, list) else list(values)
+        size = self.records or len(values)
+        return [
+            self._pack(values[start : start + size])
+            for start in range(0, len(values), size)
+        ]
+
+    def _pack(self, values):
+        header = {
+            "version": VERSION,
+            "codec": self.codec.name,
+            "compression": self.compression,
+            "count": len(values),
+        }
+        payload = self.codec.join(values)
+        if self._compress:
+            payload = self._compress(payload)
+        return MAGIC + json.dumps(header).encode("utf8") + b"\n" + payload
+
+    def unpack(self, data):
+        """Return the header of the envelope ``data`` and its decoded
+        values.
+        """
+        index = data.index(b"\n")
+        header = json.loads(data[len(MAGIC) : index])
+        if header["version"] > VERSION:
+            raise ValueError(f"unsupported envelope version: {header['version']}")
+        payload = data[index + 1 :]
+        compression = header["compression"]
+        if compression:
+            if compression not in self._decompress:
+                self._decompress[compression] = get_compression(compression)[1]
+            payload = self._decompress[compression](payload)
+        name = header["codec"]
+        if name not in self._codecs:
+            self._codecs[name] = get_codec(name)
+        return header, self._codecs[name].split(payload)
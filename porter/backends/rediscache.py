@@ -13,7 +13,8 @@ class RedisCache(RedisBase):
     :param db: db (zero-based numeric index) on Redis Server to connect.
     :param key_prefix: A prefix that should be added to all keys.
 
-    Any additional keyword arguments will be passed to ``redis.Redis``.
+    Any additional keyword arguments will be passed to
+    :func:`porter.backends.connection.get_pool`.
     """
 
     def __init__(
@@ -31,10 +32,24 @@ class RedisCache(RedisBase):
         return self.load_object(self._read_client.hget(self._get_prefix() + key, field))
 
     def getmany(self, key, fields):
-        return [self.load_object(_) for _ in self._read_client.mget(key, fields)]
+        values = self._read_client.hmget(self._get_prefix() + key, fields)
+        return [self.load_object(_) for _ in values]
 
     def getall(self, key):
-        return self._read_client.hgetall(self._get_prefix() + key)
+        return self._load_mapping(self._read_client.hgetall(self._get_prefix() + key))
+
+    def getall_many(self, keys):
+        """Fetch the whole hashes of several ``keys`` in one round trip."""
+        pipe = self._read_client.pipeline(transaction=False)
+        for key in keys:
+            pipe.hgetall(self._get_prefix() + key)
+        return [self._load_mapping(mapping) for mapping in pipe.execute()]
+
+    def _load_mapping(self, mapping):
+        return {
+            field.decode("utf8"): self.load_object(value)
+            for field, value in iteritems_wrapper(mapping)
+        }
 
     def set(self, key, field=None, value=None):
         dump = self.dump_object(value)
@@ -54,4 +69,7 @@ class RedisCache(RedisBase):
         return self._read_client.hexists(self._get_prefix() + key, field)
 
     def hasall(self, key, fields):
-        return all((self.has(key, field) for field in fields))
+        pipe = self._read_client.pipeline(transaction=False)
+        for field in fields:
+            pipe.hexists(self._get_prefix() + key, field)
+        return all(pipe.execute())
@@ -2,8 +2,20 @@
 # -*- coding: utf-8 -*-
 
 import collections
+from collections.abc import Iterable
+from itertools import islice
 
-from porter.backends.base import RedisBase
+from redis.exceptions import ResponseError
+
+from porter.backends.base import RedisBase, iteritems_wrapper
+from porter.backends.envelope import Envelope, is_envelope
+from porter.backends.scripts import PUSH_CHECKPOINT
+
+WAKEUP_SUFFIX = ".wakeup"
+# commands buffered by a push pipeline before it is sent
+PIPELINE_CHUNKS = 8
+# checkpoint field counting the values of a batch pushed so far
+PENDING_FIELD = "pending_offset"
 
 
 class RedisQueue(RedisBase):
@@ -14,8 +26,22 @@ class RedisQueue(RedisBase):
     :param password: password authentication for the Redis server.
     :param db: db (zero-based numeric index) on Redis Server to connect.
     :param key_prefix: A prefix that should be added to all keys.
+    :param envelope: whether to pack the values pushed into envelopes.
+    :param envelope_records: maximum number of values per envelope, a whole
+                             batch per envelope if ``None``, :meth:`push`
+                             cutting batches every ``chunk_records`` values.
+    :param compression: compression of the envelopes, ``zlib``, ``lz4`` or
+                        ``zstd``.
+    :param chunk_records: maximum number of values per push command.
+    :param chunk_bytes: maximum size of the values of a push command, in
+                        bytes, a larger value being pushed alone.
 
-    Any additional keyword arguments will be passed to ``redis.Redis``.
+    Envelopes are unpacked by the pop methods whatever ``envelope`` is, the
+    values left over being returned by the next pops of the instance. The
+    length of a queue counts its elements, envelopes or values.
+
+    Any additional keyword arguments will be passed to
+    :func:`porter.backends.connection.get_pool`.
     """
 
     def __init__(
@@ -25,9 +51,28 @@ class RedisQueue(RedisBase):
         password=None,
         db=0,
         key_prefix=None,
+        envelope=False,
+        envelope_records=None,
+        compression=None,
+        chunk_records=1000,
+        chunk_bytes=1 << 20,
         **kwargs
     ):
         super(RedisQueue, self).__init__(host, port, password, db, key_prefix, **kwargs)
+        self._push_checkpoint = self._write_client.register_script(PUSH_CHECKPOINT)
+        # whether the server supports LPOP with a count, unknown until used
+        self._lpop_count = None
+        self.envelope = envelope
+        self._envelope = Envelope(
+            self.codec, records=envelope_records, compression=compression
+        )
+        # values unpacked but not popped yet, and values per element, by queue
+        self._unpacked = {}
+        self._element_size = {}
+        self.chunk_records = chunk_records
+        self.chunk_bytes = chunk_bytes
+        # values to skip from the next batch, by checkpoint hash and field
+        self._pending = {}
 
     def range(self, key, start, end):
         return self._read_client.lrange(self._get_prefix() + key, start, end)
@@ -36,18 +81,297 @@ class RedisQueue(RedisBase):
         return self._read_client.llen(self._get_prefix() + key)
 
     def push(self, key, values):
-        if isinstance(values, (tuple, list, collections.Generator)):
-            values = (self.dump_object(_) for _ in values)
-            return self._write_client.rpush(self._get_prefix() + key, *values)
-        else:
-            values = self.dump_object(values)
-            return self._write_client.rpush(self._get_prefix() + key, values)
+        """Push ``values``, any iterable of values or a single value, and
+        return the new length of the queue. Values are serialized and sent
+        a chunk at a time, see :meth:`push_raw`.
+        """
+        if isinstance(values, (str, bytes, dict)) or not isinstance(values, Iterable):
+            values = [values]
+        return self.push_raw(key, self._dump_chunks(values))
+
+    def pack(self, values):
+        """Pack already serialized ``values`` into envelopes if enabled."""
+        return self._envelope.pack(values) if self.envelope else values
+
+    def push_raw(self, key, values):
+        """Push already serialized ``values`` as they are, skipping
+        :meth:`dump_object`, and return the new length of the queue.
+
+        ``values`` are consumed lazily and sent as pipelined commands of at
+        most ``chunk_records`` values and ``chunk_bytes`` bytes each, so that
+        no command blocks the server for long, the pipeline being flushed
+        every ``PIPELINE_CHUNKS`` commands.
+        """
+        name = self._get_prefix() + key
+        pipe = self._write_client.pipeline(transaction=False)
+        length = None
+        for i, chunk in enumerate(self._chunks(values), 1):
+            self._push_chunk(pipe, name, chunk)
+            if i % PIPELINE_CHUNKS == 0:
+                length = pipe.execute()[-1]
+        if len(pipe):
+            length = pipe.execute()[-1]
+        return self.len(key) if length is None else length
+
+    def _push_chunk(self, pipe, name, values):
+        pipe.rpush(name, *values)
+
+    def _dump_chunks(self, values):
+        """Serialize ``values`` and pack them into envelopes if enabled,
+        ``chunk_records`` values at a time.
+        """
+        values = iter(values)
+        while True:
+            batch = list(islice(values, self.chunk_records))
+            if not batch:
+                return
+            yield from self.pack(self.dump_objects(batch))
+
+    def _chunks(self, values):
+        """Group ``values`` into lists capped by ``chunk_records`` values and
+        ``chunk_bytes`` bytes.
+        """
+        chunk = []
+        size = 0
+        for value in values:
+            if chunk and (
+                len(chunk) >= self.chunk_records or size + len(value) > self.chunk_bytes
+            ):
+                yield chunk
+                chunk = []
+                size = 0
+            chunk.append(value)
+            size += len(value)
+        if chunk:
+            yield chunk
+
+    def push_checkpoint(
+        self,
+        key,
+        values,
+        cache,
+        cache_key,
+        mapping=None,
+        maxlen=0,
+        pending_field=PENDING_FIELD,
+    ):
+        """Push already serialized ``values``, packed into envelopes if
+        enabled, and store ``mapping`` in the hash ``cache_key`` of the
+        :class:`RedisCache` ``cache``. Nothing happens if the queue holds
+        ``maxlen`` elements or more already.
+
+        The values are sent in chunks of at most ``chunk_records`` values and
+        ``chunk_bytes`` bytes, each one pushed by an atomic call of its own
+        so that no call blocks the server for long. The first chunk may be
+        refused, the next ones follow in a pipeline and the last one stores
+        ``mapping``. Every chunk also stores the number of values of the
+        batch pushed so far in the field ``pending_field`` of the hash: if
+        the push is interrupted in between, the checkpoint still points
+        before the batch, and the values already pushed are skipped when it
+        is pushed again on resume.
+
+        Returns the new length of the queue, or -1 if the push was refused.
+        """
+        state = (cache._get_prefix() + cache_key, pending_field)
+        offset = self._pending.pop(state, None)
+        if offset is None:
+            offset = cache.get(cache_key, pending_field) or 0
+        skip = min(offset, len(values))
+        chunks = list(self._chunks(values[skip:])) or [[]]
+        last = len(chunks) - 1
+        # values left to skip from the next batches, if this one is shorter
+        left = offset - skip
+
+        def checkpoint(i, pushed):
+            if i < last:
+                return {pending_field: pushed}
+            if offset or last:
+                return dict(mapping or {}, **{pending_field: left})
+            return mapping
+
+        pushed = skip + len(chunks[0])
+        length = self._push_script(
+            key, chunks[0], cache, cache_key, checkpoint(0, pushed), maxlen
+        )
+        if length < 0:
+            self._pending[state] = offset
+            return length
+        pipe = self._write_client.pipeline(transaction=False)
+        for i, chunk in enumerate(chunks[1:], 1):
+            pushed += len(chunk)
+            self._push_script(
+                key, chunk, cache, cache_key, checkpoint(i, pushed), client=pipe
+            )
+            if i % PIPELINE_CHUNKS == 0 or i == last:
+                length = pipe.execute()[-1]
+        self._pending[state] = left
+        return length
+
+    def _push_script(
+        self,
+        key,
+        values,
+        cache=None,
+        cache_key=None,
+        mapping=None,
+        maxlen=0,
+        client=None,
+    ):
+        """Push ``values`` and store ``mapping`` with a single script call,
+        onto the pipeline ``client`` if given. Without ``cache``, ``mapping``
+        must be empty.
+        """
+        name = self._get_prefix() + key
+        mapping = mapping or {}
+        args = [maxlen or 0, len(mapping)]
+        for field, value in iteritems_wrapper(mapping):
+            args.extend((field, cache.dump_object(value)))
+        args.extend(self.pack(values))
+        hash_name = cache._get_prefix() + cache_key if cache is not None else name
+        return self._push_checkpoint(keys=[name, hash_name], args=args, client=client)
+
+    def push_partitions(self, batches, maxlen=0):
+        """Push already serialized values, packed into envelopes if enabled,
+        onto several queues in pipelines, ``batches`` mapping the keys of the
+        queues to their values. The push onto a queue is refused if it holds
+        ``maxlen`` elements or more already.
+
+        The values are sent in chunks as by :meth:`push_checkpoint`, the
+        first chunk of every queue in a first pipeline, then the next chunks
+        of the queues not refused.
+
+        Returns the new lengths of the queues by key, -1 for those refused.
+        """
+        chunks = {
+            key: list(self._chunks(values)) or [[]]
+            for key, values in iteritems_wrapper(batches)
+        }
+        pipe = self._write_client.pipeline(transaction=False)
+        for key, key_chunks in chunks.items():
+            self._push_script(key, key_chunks[0], maxlen=maxlen, client=pipe)
+        lengths = dict(zip(chunks, pipe.execute()))
+
+        rest = [
+            (key, chunk)
+            for key, key_chunks in chunks.items()
+            if lengths[key] >= 0
+            for chunk in key_chunks[1:]
+        ]
+        keys = []
+        for i, (key, chunk) in enumerate(rest, 1):
+            self._push_script(key, chunk, client=pipe)
+            keys.append(key)
+            if i % PIPELINE_CHUNKS == 0 or i == len(rest):
+                lengths.update(zip(keys, pipe.execute()))
+                keys = []
+        return lengths
 
     def pop(self, key):
-        return self.load_object(self._read_client.lpop(self._get_prefix() + key))
+        values = self._take(key, 1)
+        if values:
+            return values[0]
+        value = self._read_client.lpop(self._get_prefix() + key)
+        if value is None:
+            return None
+        return self._unpack(key, [value], 1)[0]
 
     def pop_many(self, key, count):
-        length = self.len(key)
-        if length < count:
-            count = length
-        return [self.pop(key) for _ in range(count)]
+        """Pop up to ``count`` values in a single round trip, with ``LPOP``
+        and a count on Redis 6.2+, or ``LRANGE`` and ``LTRIM`` in a
+        transaction on older servers.
+        """
+        values = self._take(key, count)
+        if len(values) < count:
+            name = self._get_prefix() + key
+            elements = self._pop_raw(name, self._elements(key, count - len(values)))
+            values.extend(self._unpack(key, elements, count - len(values)))
+        return values
+
+    def pop_batch(self, key, max_items, timeout=0):
+        """Wait up to ``timeout`` seconds (forever if 0) for the queue to be
+        non-empty, then pop up to ``max_items`` values. Returns an empty list
+        on timeout.
+        """
+        values = self._take(key, max_items)
+        if values:
+            return values
+        name = self._get_prefix() + key
+        popped = self._read_client.blpop(name, timeout=timeout)
+        if popped is None:
+            return []
+        elements = [popped[1]]
+        count = self._elements(key, max_items) - 1
+        if count > 0:
+            elements.extend(self._pop_raw(name, count))
+        return self._unpack(key, elements, max_items)
+
+    def signal(self, key):
+        """Wake up a producer waiting in :meth:`wait_signal` for the queue
+        ``key``, typically called by consumers once they popped a batch.
+        """
+        name = self._get_prefix() + key + WAKEUP_SUFFIX
+        pipe = self._write_client.pipeline(transaction=False)
+        pipe.lpush(name, 1)
+        pipe.ltrim(name, 0, 0)
+        pipe.execute()
+
+    def wait_signal(self, key, timeout):
+        """Wait up to ``timeout`` seconds for a :meth:`signal` on the queue
+        ``key``, return whether one came. Sub-second timeouts need Redis 6+.
+        """
+        name = self._get_prefix() + key + WAKEUP_SUFFIX
+        return self._read_client.blpop(name, timeout=timeout) is not None
+
+    def _take(self, key, count):
+        unpacked = self._unpacked.get(key)
+        if not unpacked:
+            return []
+        return [unpacked.popleft() for _ in range(min(count, len(unpacked)))]
+
+    def _elements(self, key, count):
+        """Number of elements to pop from the queue ``key`` for ``count``
+        values, judging by the envelopes popped last.
+        """
+        return max(-(-count // self._element_size.get(key, 1)), 1)
+
+    def _unpack(self, key, elements, count):
+        """Load popped ``elements``, unpacking envelopes, and keep the values
+        past the first ``count`` for the next pops.
+        """
+        if not any(is_envelope(element) for element in elements):
+            return self.load_objects(elements)
+
+        values = []
+        plain = []
+        for element in elements:
+            if not is_envelope(element):
+                plain.append(element)
+                continue
+            values.extend(self.load_objects(plain))
+            plain = []
+            header, unpacked = self._envelope.unpack(element)
+            self._element_size[key] = max(header["count"], 1)
+            values.extend(unpacked)
+        values.extend(self.load_objects(plain))
+        if len(values) > count:
+            unpacked = self._unpacked.setdefault(key, collections.deque())
+            unpacked.extend(values[count:])
+            del values[count:]
+        return values
+
+    def _pop_raw(self, name, count):
+        if self._lpop_count is not False:
+            try:
+                values = self._write_client.execute_command("LPOP", name, count)
+                self._lpop_count = True
+                return values or []
+            except ResponseError:
+                if self._lpop_count:
+                    raise
+                self._lpop_count = False
+
+        pipe = self._write_client.pipeline(transaction=True)
+        pipe.lrange(name, 0, count - 1)
+        pipe.ltrim(name, count, -1)
+        values, _ = pipe.execute()
+        return values
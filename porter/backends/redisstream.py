@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import socket
+
+from redis.exceptions import ResponseError
+
+from porter.backends.base import iteritems_wrapper
+from porter.backends.envelope import is_envelope
+from porter.backends.redisqueue import RedisQueue
+from porter.backends.scripts import PUSH_STREAM_CHECKPOINT, STREAM_BACKLOG
+
+FIELD = "v"
+DEFAULT_GROUP = "porter"
+
+
+class RedisStream(RedisQueue):
+    """Queue backed by a Redis stream, each value in the ``v`` field of an
+    entry, read by consumer groups.
+
+    :param host: address of the Redis server or an object which API is
+                 compatible with the official Python Redis client (redis-py).
+    :param port: port number on which Redis server listens for connections.
+    :param password: password authentication for the Redis server.
+    :param db: db (zero-based numeric index) on Redis Server to connect.
+    :param key_prefix: A prefix that should be added to all keys.
+    :param maxlen: approximate length the streams are trimmed to after each
+                   push, never trimmed if ``None``. Only the entries every
+                   consumer group acknowledged are trimmed, none while a
+                   stream has no group.
+    :param group: consumer group the pop methods read with.
+    :param consumer: consumer name the pop methods read as, made of the host
+                     name and the process id by default.
+
+    The length of a stream is the backlog of its slowest consumer group, the
+    entries not delivered yet plus the ones not acknowledged, or the length
+    of the stream if it has no group. It is measured server side, from the
+    lag of the groups on Redis 7.0+ or by counting the entries after their
+    last delivered id otherwise, and checked by the same script call as the
+    push it may refuse.
+
+    Any additional keyword arguments will be passed to :class:`RedisQueue`.
+    """
+
+    def __init__(
+        self,
+        host="localhost",
+        port=6379,
+        password=None,
+        db=0,
+        key_prefix=None,
+        maxlen=None,
+        group=None,
+        consumer=None,
+        **kwargs,
+    ):
+        super(RedisStream, self).__init__(
+            host, port, password, db, key_prefix, **kwargs
+        )
+        self._push_stream_checkpoint = self._write_client.register_script(
+            PUSH_STREAM_CHECKPOINT
+        )
+        self._stream_backlog = self._read_client.register_script(STREAM_BACKLOG)
+        self.maxlen = maxlen
+        self.group = group or DEFAULT_GROUP
+        self.consumer = consumer or f"{socket.gethostname()}-{os.getpid()}"
+        # (key, group) pairs known to exist
+        self._groups = set()
+
+    def range(self, key, start="-", end="+", count=None):
+        """Return the ``(id, value)`` entries between the ids ``start`` and
+        ``end``.
+        """
+        entries = self._read_client.xrange(
+            self._get_prefix() + key, start, end, count=count
+        )
+        return self._load_entries(entries)
+
+    def len(self, key):
+        return self._stream_backlog(keys=[self._get_prefix() + key])
+
+    def _push_chunk(self, pipe, name, values):
+        args = [0, self.maxlen or 0, FIELD, 0, *values]
+        self._push_stream_checkpoint(keys=[name, name], args=args, client=pipe)
+
+    def _push_script(
+        self,
+        key,
+        values,
+        cache=None,
+        cache_key=None,
+        mapping=None,
+        maxlen=0,
+        client=None,
+    ):
+        name = self._get_prefix() + key
+        mapping = mapping or {}
+        args = [maxlen or 0, self.maxlen or 0, FIELD, len(mapping)]
+        for field, value in iteritems_wrapper(mapping):
+            args.extend((field, cache.dump_object(value)))
+        args.extend(self.pack(values))
+        hash_name = cache._get_prefix() + cache_key if cache is not None else name
+        return self._push_stream_checkpoint(
+            keys=[name, hash_name], args=args, client=client
+        )
+
+    def create_group(self, key, group=None, start="0"):
+        """Create the consumer ``group`` of the stream ``key``, reading from
+        the entry ``start`` on, unless it exists already.
+        """
+        try:
+            self._write_client.xgroup_create(
+                self._get_prefix() + key, group or self.group, id=start, mkstream=True
+            )
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        self._groups.add((key, group or self.group))
+
+    def read_group(self, key, count=1, block=None, group=None, consumer=None):
+        """Read up to ``count`` entries not delivered to the consumer
+        ``group`` yet, waiting up to ``block`` milliseconds for some if set.
+        The group is created on first use.
+
+        Returns ``(id, value)`` pairs, the values of an envelope sharing its
+        entry id. Entries are pending until acknowledged with :meth:`ack`.
+        """
+        name = self._get_prefix() + key
+        group = group or self.group
+        if (key, group) not in self._groups:
+            self.create_group(key, group)
+        streams = {name: ">"}
+        try:
+            result = self._read_client.xreadgroup(
+                group, consumer or self.consumer, streams, count=count, block=block
+            )
+        except ResponseError as e:
+            # the stream was deleted since
+            if "NOGROUP" not in str(e):
+                raise
+            self.create_group(key, group)
+            result = self._read_client.xreadgroup(
+                group, consumer or self.consumer, streams, count=count, block=block
+            )
+        if not result:
+            return []
+        return self._load_entries(result[0][1])
+
+    def ack(self, key, ids, group=None):
+        """Acknowledge the entries ``ids`` read by the consumer ``group``."""
+        ids = list(dict.fromkeys(ids))
+        if not ids:
+            return 0
+        return self._write_client.xack(
+            self._get_prefix() + key, group or self.group, *ids
+        )
+
+    def pop(self, key):
+        values = self.pop_many(key, 1)
+        return values[0] if values else None
+
+    def pop_many(self, key, count):
+        """Read and acknowledge up to ``count`` entries of the consumer group
+        of the instance. Envelopes count as one entry.
+        """
+        return self._pop(key, count)
+
+    def pop_batch(self, key, max_items, timeout=0):
+        """Wait up to ``timeout`` seconds (forever if 0) for entries, then
+        read and acknowledge up to ``max_items`` of them. Returns an empty
+        list on timeout.
+        """
+        return self._pop(key, max_items, block=int(timeout * 1000))
+
+    def _pop(self, key, count, block=None):
+        entries = self.read_group(key, count=count, block=block)
+        self.ack(key, [entry_id for entry_id, _ in entries])
+        return [value for _, value in entries]
+
+    def _load_entries(self, entries):
+        field = FIELD.encode("utf8")
+        ids = [entry_id for entry_id, _ in entries]
+        values = [fields[field] for _, fields in entries]
+        if not any(is_envelope(value) for value in values):
+            return list(zip(ids, self.load_objects(values)))
+
+        loaded = []
+        for entry_id, value in zip(ids, values):
+            if is_envelope(value):
+                _, unpacked = self._envelope.unpack(value)
+                loaded.extend((entry_id, v) for v in unpacked)
+            else:
+                loaded.append((entry_id, self.load_object(value)))
+        return loaded
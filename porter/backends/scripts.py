@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Lua scripts run server side by the Redis backends."""
+
+# Push a batch onto a list and store its checkpoint in a hash, atomically.
+#
+# KEYS[1]: list to push onto
+# KEYS[2]: hash holding the checkpoint
+# ARGV[1]: refuse the push while the list holds that many elements, 0 to
+#          never refuse
+# ARGV[2]: number of checkpoint fields, followed by as many field/value pairs
+#          and then by the elements to push
+#
+# Returns the new length of the list, or -1 if the push was refused.
+PUSH_CHECKPOINT = """
+local maxlen = tonumber(ARGV[1])
+local length = redis.call("LLEN", KEYS[1])
+if maxlen > 0 and length >= maxlen then
+    return -1
+end
+local first = 3 + 2 * tonumber(ARGV[2])
+for i = first, #ARGV, 4096 do
+    length = redis.call("RPUSH", KEYS[1], unpack(ARGV, i, math.min(i + 4095, #ARGV)))
+end
+if first > 3 then
+    redis.call("HMSET", KEYS[2], unpack(ARGV, 3, first - 1))
+end
+return length
+"""
+
+# Lua functions measuring the backlog of a stream, prepended to the scripts
+# using them.
+#
+# count_from(key, start, exclusive): number of entries of the stream from the
+# id start on, or after it if exclusive.
+#
+# backlog(key, count_kept): backlog of the slowest consumer group of the
+# stream, its undelivered entries, from the lag of the group on Redis 7.0+ or
+# counted after its last delivered id, plus its pending entries; the length
+# of the stream while it has no group. With count_kept, also returns the
+# number of entries some group has not acknowledged yet, the whole stream
+# while it has no group.
+STREAM_BACKLOG_FUNCTIONS = """
+local function count_from(key, start, exclusive)
+    local entries = redis.call("XRANGE", key, start, "+")
+    if exclusive and #entries > 0 and entries[1][1] == start then
+        return #entries - 1
+    end
+    return #entries
+end
+
+local function backlog(key, count_kept)
+    local length = redis.call("XLEN", key)
+    if length == 0 then
+        return 0, 0
+    end
+    local groups = redis.call("XINFO", "GROUPS", key)
+    if #groups == 0 then
+        return length, length
+    end
+    local slowest, kept = 0, 0
+    for _, group in ipairs(groups) do
+        local info = {}
+        for i = 1, #group, 2 do
+            info[group[i]] = group[i + 1]
+        end
+        local last = info["last-delivered-id"]
+        local unread = info["lag"]
+        if not unread then
+            unread = count_from(key, last, true)
+        end
+        slowest = math.max(slowest, unread + info["pending"])
+        if count_kept then
+            if info["pending"] > 0 then
+                local oldest = redis.call("XPENDING", key, info["name"])[2]
+                kept = math.max(kept, count_from(key, oldest, false))
+            else
+                kept = math.max(kept, count_from(key, last, true))
+            end
+        end
+    end
+    return slowest, kept
+end
+"""
+
+# Return the backlog of a stream, see backlog() above.
+#
+# KEYS[1]: stream
+STREAM_BACKLOG = (
+    STREAM_BACKLOG_FUNCTIONS
+    + """
+local length = backlog(KEYS[1], false)
+return length
+"""
+)
+
+# Append a batch to a stream and store its checkpoint in a hash, atomically.
+#
+# KEYS[1]: stream to append to
+# KEYS[2]: hash holding the checkpoint
+# ARGV[1]: refuse the push while the backlog of the stream is that long, 0 to
+#          never refuse
+# ARGV[2]: approximate length to trim the stream to, 0 to never trim; only
+#          the entries acknowledged by every consumer group are trimmed
+# ARGV[3]: field of the entries holding the values
+# ARGV[4]: number of checkpoint fields, followed by as many field/value pairs
+#          and then by the values to append
+#
+# Returns the new length of the stream, or -1 if the push was refused.
+PUSH_STREAM_CHECKPOINT = (
+    STREAM_BACKLOG_FUNCTIONS
+    + """
+local maxlen = tonumber(ARGV[1])
+if maxlen > 0 and backlog(KEYS[1], false) >= maxlen then
+    return -1
+end
+local first = 5 + 2 * tonumber(ARGV[4])
+for i = first, #ARGV do
+    redis.call("XADD", KEYS[1], "*", ARGV[3], ARGV[i])
+end
+local trim = tonumber(ARGV[2])
+if trim > 0 and redis.call("XLEN", KEYS[1]) > trim then
+    local _, kept = backlog(KEYS[1], true)
+    redis.call("XTRIM", KEYS[1], "MAXLEN", "~", math.max(trim, kept))
+end
+if first > 5 then
+    redis.call("HMSET", KEYS[2], unpack(ARGV, 5, first - 1))
+end
+return redis.call("XLEN", KEYS[1])
+"""
+)
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Backpressure:
+    """Flow control between a producer and the consumers of a queue.
+
+    Pushes are refused once the queue holds ``high`` elements; the producer
+    then waits until consumers brought it down to ``low``. The queue length is
+    polled at intervals doubling from ``min_interval`` up to ``max_interval``
+    while it does not go down, and shortened to the time the observed drain
+    rate needs to reach ``low`` as soon as it does. With ``wakeup`` set, the
+    producer also listens for :meth:`RedisQueue.signal` from consumers and
+    polls right away when one arrives.
+
+    :param queue: :class:`RedisQueue` holding the queue.
+    :param key: key of the queue.
+    :param high: high watermark, the maximum length of the queue.
+    :param low: low watermark, defaults to half of ``high``.
+    :param min_interval: shortest time between two polls, in seconds.
+    :param max_interval: longest time between two polls, in seconds.
+    :param wakeup: whether to listen for wakeup signals from consumers.
+    """
+
+    def __init__(
+        self,
+        queue,
+        key,
+        high,
+        low=None,
+        min_interval=0.01,
+        max_interval=10,
+        wakeup=False,
+    ):
+        self.queue = queue
+        self.key = key
+        self.high = high
+        self.low = min(high // 2 if low is None else low, high)
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, min_interval)
+        self.wakeup = wakeup
+        # time spent throttled, in seconds, and how many times it happened
+        self.throttled = 0.0
+        self.throttles = 0
+
+    def wait(self):
+        """Block until the queue is down to the low watermark, return the
+        time waited in seconds.
+        """
+        start = last_time = time.monotonic()
+        last_length = None
+        interval = self.min_interval
+        while True:
+            length = self.queue.len(self.key)
+            if length <= self.low:
+                break
+
+            now = time.monotonic()
+            if last_length is not None and length < last_length:
+                # consumers are draining, come back when they should be done
+                rate = (last_length - length) / max(now - last_time, 1e-6)
+                interval = (length - self.low) / rate
+            else:
+                interval *= 2
+            interval = min(max(interval, self.min_interval), self.max_interval)
+            last_length, last_time = length, now
+
+            logger.debug(f"queue length {length}, wait for {interval:.3f}s...")
+            if self.wakeup:
+                self.queue.wait_signal(self.key, interval)
+            else:
+                time.sleep(interval)
+
+        waited = time.monotonic() - start
+        self.throttled += waited
+        self.throttles += 1
+        return waited
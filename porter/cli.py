@@ -15,6 +15,7 @@ from porter.reader import (
     FileReader,
     JsonReader,
     MongoReader,
+    MySQLDatabaseReader,
     MySQLReader,
 )
 
@@ -93,10 +94,20 @@ def process_configure(config_file):
 @click.option(
     "-t",
     "--time-sleep",
-    type=int,
+    type=float,
     default=10,
     show_default=True,
-    help="Time to wait when up to the maximum limit of queue",
+    help="Longest time to wait between two polls of a full queue",
+)
+@click.option(
+    "-w",
+    "--workers",
+    type=int,
+    default=1,
+    show_default=True,
+    help="Number of processes pushing byte ranges of a file, "
+    "primary key ranges of a MySQL table or the tables of a MySQL database "
+    "in parallel",
 )
 @click.option(
     "-C",
@@ -133,6 +144,7 @@ def main(
     limit_scale,
     blocking,
     time_sleep,
+    workers,
     clean_type,
     task_type,
     output_task_file,
@@ -168,6 +180,9 @@ def main(
         else:
             click.echo("Error config, sharding flag must be [0, 1, 2]")
             sys.exit(-1)
+    elif reader_type == "mysql" and not reader_config["table"]:
+        # no table, sync the whole database
+        ReaderKlass = MySQLDatabaseReader
     else:
         ReaderKlass = REDAERS[reader_type]
 
@@ -178,6 +193,7 @@ def main(
         block=blocking,
         scale=limit_scale,
         sleep=time_sleep,
+        workers=workers,
     )
 
     # start sync task
@@ -186,7 +202,7 @@ def main(
 
     # monitor task status
     elif todo == "monitor":
-        print(json.dumps(reader.status(), ensure_ascii=False, indent=4))
+        print(json.dumps(reader.status(), ensure_ascii=False, indent=4, default=str))
 
     # clear task cache
     elif todo == "clear" and clean_type:
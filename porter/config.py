@@ -17,9 +17,21 @@ DEFAULT_CONFIG = {
         "host": "localhost",
         "port": 6379,
         "password": None,
+        "unix_socket_path": None,
+        "socket_keepalive": False,
+        "socket_timeout": None,
+        "socket_connect_timeout": None,
+        "max_connections": None,
         "key": "PORTER_TEST",
         "queue_key_prefix": "porter.queue.",
         "cache_key_prefix": "porter.cache.",
+        "queue": "list",
+        "stream": {"maxlen": None},
+        "partitions": {"count": 1, "field": None},
+        "codec": "json",
+        "envelope": {"enabled": False, "records": None, "compression": None},
+        "chunk": {"records": 1000, "bytes": 1048576},
+        "backpressure": {"low_watermark": None, "min_interval": 0.01, "wakeup": False},
     },
     "mysqlproxy": {
         "host": "localhost",
@@ -39,13 +51,43 @@ DEFAULT_CONFIG = {
         "user": "test",
         "password": "123456",
         "table": None,
+        "include": [],
+        "exclude": [],
         "pk": "id",
         "column": None,
+        "where": None,
+        "watermark": None,
+        "streaming": False,
+        "net_write_timeout": 3600,
+        "split": "minmax",
+        "total": "exact",
+        "prefetch": 2,
+        "rename": {},
+        "cast": {},
         "appendices": list(),
         "append_db_info": False,
     },
-    "file": {"path": None, "delimiter": ",", "header": True, "appendices": list()},
-    "json": {"path": None, "appendices": list()},
+    "file": {
+        "path": None,
+        "delimiter": ",",
+        "quotechar": '"',
+        "header": True,
+        "column": None,
+        "rename": {},
+        "cast": {},
+        "appendices": list(),
+        "count_workers": 1,
+    },
+    "json": {
+        "path": None,
+        "format": "lines",
+        "json_path": None,
+        "column": None,
+        "rename": {},
+        "cast": {},
+        "appendices": list(),
+        "count_workers": 1,
+    },
     "mongo": {
         "host": "localhost",
         "port": 3306,
@@ -54,6 +96,11 @@ DEFAULT_CONFIG = {
         "password": "123456",
         "collection": None,
         "column": None,
+        "filter": {},
+        "prefetch": 2,
+        "total": "exact",
+        "rename": {},
+        "cast": {},
         "appendices": list(),
     },
     "porter_dir": os.path.expanduser("~/.porter/"),
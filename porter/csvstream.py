@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Reading of RFC 4180 CSV records on top of the binary line batches of
+:func:`porter.utils.batch_read_lines`.
+
+A quoted field may hold delimiters and line breaks, so a record is made of
+as many lines as needed to balance its quotes. Records are handed out
+undecoded and only parsed by :class:`CsvParser`, where rows without any
+quote take a plain ``split`` instead of the :mod:`csv` module.
+"""
+import csv
+import io
+import mmap
+import os
+
+from porter.utils import COUNT_CHUNK_SIZE, READ_BUFFER_SIZE, batch_read_lines
+
+
+def batch_read_csv(
+    n, f_obj, quotechar='"', start=0, end=None, buffer_size=READ_BUFFER_SIZE
+):
+    """Read the binary CSV file ``f_obj`` in batches of at most ``n``
+    records.
+
+    Yields the same ``(count, offset, batch)`` tuples as
+    :func:`porter.utils.batch_read_lines`, the offset always falling right
+    after a complete record. Records lose their trailing line break.
+    """
+    quote = quotechar.encode("utf8")
+    count = start
+    pos = offset = f_obj.tell()
+    partial = None
+    lines = batch_read_lines(n, f_obj, end=end, buffer_size=buffer_size)
+    for _, batch_end, batch in lines:
+        # no record left open and no quote at all: the lines are the records
+        if partial is None and quote not in b"".join(batch):
+            count += len(batch)
+            pos = offset = batch_end
+            yield count, offset, [line.rstrip(b"\r") for line in batch]
+            continue
+
+        records = []
+        for line in batch:
+            # the last line of a file may lack its newline
+            pos = min(pos + len(line) + 1, batch_end)
+            if partial is not None:
+                partial.append(line)
+                if not line.count(quote) % 2:
+                    continue
+                line = b"\n".join(partial)
+                partial = None
+            elif quote in line and line.count(quote) % 2:
+                partial = [line]
+                continue
+            records.append(line.rstrip(b"\r"))
+            offset = pos
+
+        # a record still open is completed by the next batch
+        if records:
+            count += len(records)
+            yield count, offset, records
+
+    if partial is not None:
+        # unbalanced quotes, leave it to the csv module to make sense of it
+        yield count + 1, pos, [b"\n".join(partial)]
+
+
+def _unquoted(chunk, quote, quoted):
+    """Yield the ``(start, end)`` spans of ``chunk`` outside quoted fields,
+    ``quoted`` telling whether it starts within one, then the state at its
+    end.
+    """
+    pos = 0
+    while True:
+        index = chunk.find(quote, pos)
+        stop = len(chunk) if index < 0 else index
+        if not quoted:
+            yield pos, stop
+        if index < 0:
+            return
+        quoted = not quoted
+        pos = index + 1
+
+
+def count_csv_records(path, quotechar='"', chunk_size=COUNT_CHUNK_SIZE):
+    """Count the records of a CSV file, the line breaks outside quoted
+    fields, by scanning its raw bytes through mmap. A last record without
+    trailing line break is counted as well.
+    """
+    size = os.path.getsize(path)
+    if not size:
+        return 0
+
+    quote = quotechar.encode("utf8")
+    count = 0
+    quoted = False
+    with open(path, "rb") as f_obj:
+        with mmap.mmap(f_obj.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            for pos in range(0, size, chunk_size):
+                chunk = buf[pos : pos + chunk_size]
+                if quote not in chunk:
+                    if not quoted:
+                        count += chunk.count(b"\n")
+                    continue
+                for start, end in _unquoted(chunk, quote, quoted):
+                    count += chunk.count(b"\n", start, end)
+                quoted ^= chunk.count(quote) % 2 == 1
+            if buf[size - 1 : size] != b"\n":
+                count += 1
+    return count
+
+
+def split_csv(
+    path, parts, start=0, end=None, quotechar='"', chunk_size=COUNT_CHUNK_SIZE
+):
+    """Split the byte range [``start``, ``end``) of a CSV file into at most
+    ``parts`` ranges whose boundaries fall right after a line break outside
+    quoted fields, ``start`` being the beginning of a record.
+    """
+    if end is None:
+        end = os.path.getsize(path)
+    if end <= start:
+        return []
+    step = max(-(-(end - start) // parts), 1)
+    quote = quotechar.encode("utf8")
+    bounds = [start]
+    # a boundary is the first line break outside quotes from ``target`` on
+    target = start + step - 1
+    quoted = False
+    with open(path, "rb") as f_obj:
+        with mmap.mmap(f_obj.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            for pos in range(start, end, chunk_size):
+                chunk = buf[pos : min(pos + chunk_size, end)]
+                if target < pos + len(chunk):
+                    for lo, hi in _unquoted(chunk, quote, quoted):
+                        while target < pos + hi:
+                            index = chunk.find(b"\n", max(lo, target - pos), hi)
+                            if index < 0:
+                                break
+                            bound = pos + index + 1
+                            if bound >= end:
+                                break
+                            bounds.append(bound)
+                            target = max(target + step, bound + step - 1)
+                quoted ^= chunk.count(quote) % 2 == 1
+                if target >= end - 1:
+                    break
+    bounds.append(end)
+    return [(s, e) for s, e in zip(bounds, bounds[1:]) if s < e]
+
+
+class CsvParser:
+    """Split undecoded CSV records into lists of fields.
+
+    :param delimiter: one character field delimiter.
+    :param quotechar: one character used to quote fields.
+    :param encoding: encoding of the records.
+    """
+
+    def __init__(self, delimiter=",", quotechar='"', encoding="utf8"):
+        self.delimiter = delimiter
+        self.quotechar = quotechar
+        self.encoding = encoding
+
+    def parse(self, record):
+        return self.parse_many([record])[0]
+
+    def parse_many(self, records):
+        """Parse a batch of records, decoding them all at once."""
+        text = b"\n".join(records).decode(self.encoding)
+        if self.quotechar not in text:
+            return [line.split(self.delimiter) for line in text.split("\n")]
+        reader = csv.reader(
+            io.StringIO(text, newline=""),
+            delimiter=self.delimiter,
+            quotechar=self.quotechar,
+        )
+        return list(reader)
@@ -22,27 +22,29 @@ class Mongo:
         self.db = self.connection[db]
         self.collection = self.db[collection]
 
-    def pagination(self, page_size, last_id=None, fields=None):
+    def pagination(self, page_size, last_id=None, fields=None, filter=None):
         """Function returns `page_size` number of documents after last_id
-        and the new last_id.
+        and the new last_id, among the documents matching `filter`.
         """
         if fields:
             fields = {k: 1 for k in fields}
 
-        if last_id is None:
-            cursor = self.collection.find(projection=fields).limit(page_size)
-        else:
-            cursor = self.collection.find(
-                filter={"_id": {"$gt": last_id}}, projection=fields
-            ).limit(page_size)
+        query = dict(filter or {})
+        if last_id is not None:
+            bound = {"_id": {"$gt": last_id}}
+            query = {"$and": [query, bound]} if query else bound
+        cursor = (
+            self.collection.find(filter=query, projection=fields)
+            .sort("_id", 1)
+            .limit(page_size)
+        )
 
         data = [x for x in cursor]
 
         if not data:
             return None, None
 
-        # Since documents are naturally ordered with _id, last document will
-        # have max id.
+        # Since documents are sorted by _id, last document will have max id.
         last_id = data[-1]["_id"]
         return data, last_id
 
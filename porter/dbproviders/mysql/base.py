@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-import pymysql
+from pymysql.converters import escape_item
 
 
 class BaseMySQL:
@@ -28,7 +28,8 @@ class BaseMySQL:
         return self.execute(sql, **kwargs)
 
     @staticmethod
-    def escape(text):
-        if isinstance(text, str):
-            return f"'{pymysql.escape_string(text)}'"
-        return text
+    def escape(value):
+        """Return ``value`` as a SQL literal: strings, dates, datetimes and
+        decimals quoted or formatted as MySQL expects, ``None`` as ``NULL``.
+        """
+        return escape_item(value, "utf8")
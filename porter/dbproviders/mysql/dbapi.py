@@ -51,12 +51,42 @@ class MysqlHelper(BaseMySQL):
         self.execute(sql, **kwargs)
         return self.cursor.fetchall()
 
+    def select_rows(self, sql, **kwargs):
+        """Execute ``sql`` and return the column names of the result and its
+        rows as tuples, lighter than the dicts of :meth:`select`.
+        """
+        cursor = self.connection.cursor(pymysql.cursors.Cursor)
+        try:
+            cursor.execute(sql)
+            columns = [field[0] for field in cursor.description or ()]
+            return columns, cursor.fetchall()
+        finally:
+            cursor.close()
+
+    def stream(self, sql, size, write_timeout=None, **kwargs):
+        """Execute ``sql`` with an unbuffered server-side cursor and yield the
+        column names of the result with its rows, as tuples, ``size`` at a
+        time, so that the result set is never held in memory at once.
+
+        The connection is busy until the rows are all read or the generator
+        is closed. ``write_timeout`` raises the ``net_write_timeout`` of the
+        session, in seconds, for the server not to drop a consumer that
+        stops reading for a while.
+        """
+        cursor = self.connection.cursor(pymysql.cursors.SSCursor)
+        try:
+            if write_timeout:
+                cursor.execute(f"SET SESSION net_write_timeout = {int(write_timeout)}")
+            cursor.execute(sql)
+            columns = [field[0] for field in cursor.description or ()]
+            while True:
+                rows = cursor.fetchmany(size)
+                if not rows:
+                    break
+                yield columns, rows
+        finally:
+            cursor.close()
+
     def close(self):
         if self.connection:
             self.connection.close()
-
-    @staticmethod
-    def escape(text):
-        if isinstance(text, str):
-            return f"'{pymysql.escape_string(text)}'"
-        return text
@@ -26,3 +26,11 @@ class InvalidConfiguration(PorterException):
     Raised if the global configuration file is not valid YAML or is
     badly constructed.
     """
+
+
+class InvalidJsonDocument(PorterException):
+    """
+    Exception for a JSON document that cannot be scanned.
+
+    Raised when the array to read is missing or the document is malformed.
+    """
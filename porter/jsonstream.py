@@ -0,0 +1,225 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Incremental reading of JSON arrays nested in arbitrarily large documents.
+
+Elements are located with a byte level scanner that only keeps the element
+being read in memory; they are handed out undecoded, along with the byte
+offset right after them, so that the caller decides when to parse them.
+"""
+import json
+import re
+
+from porter.exceptions import InvalidJsonDocument
+
+READ_BUFFER_SIZE = 4 * 1024 * 1024
+
+WHITESPACE = re.compile(rb"[^ \t\n\r]")
+STRUCTURE = re.compile(rb'[\[\]{}"]')
+STRING_SPECIAL = re.compile(rb'["\\]')
+SCALAR_END = re.compile(rb"[,\]} \t\n\r]")
+
+
+class JsonArrayScanner:
+    """Scan the elements of the array found at ``path`` in the binary file
+    ``f_obj``.
+
+    :param f_obj: binary file object positioned at the start of the document,
+                  or right after an element of the array if ``resume`` is set.
+    :param path: dotted keys leading from the top-level object to the array,
+                 ``None`` if the document itself is the array.
+    :param resume: whether ``f_obj`` is positioned inside the array already.
+    """
+
+    def __init__(self, f_obj, path=None, resume=False, buffer_size=READ_BUFFER_SIZE):
+        self.f_obj = f_obj
+        self.path = path.split(".") if path else []
+        self.buffer_size = buffer_size
+        self.buf = b""
+        self.pos = 0
+        self.base = f_obj.tell()
+        self.eof = False
+        self.done = False
+        self.first = not resume
+        # byte offset right after the last element read or skipped
+        self.offset = self.base
+        if not resume:
+            self._enter_array()
+
+    @property
+    def position(self):
+        """Byte offset of the scanner in the file."""
+        return self.base + self.pos
+
+    def read(self, n):
+        """Return up to ``n`` undecoded elements, fewer at the end of the
+        array.
+        """
+        elements = []
+        while len(elements) < n and self._next_element():
+            end = self._scan_value(keep=True)
+            elements.append(self.buf[self.pos : end])
+            self.pos = end
+            self.offset = self.position
+        return elements
+
+    def skip(self, n=None):
+        """Skip ``n`` elements, or all the rest of them, and return how many
+        were skipped.
+        """
+        skipped = 0
+        while (n is None or skipped < n) and self._next_element():
+            self.pos = self._scan_value(keep=False)
+            self.offset = self.position
+            skipped += 1
+        return skipped
+
+    def _fill(self):
+        if self.eof:
+            return False
+        chunk = self.f_obj.read(self.buffer_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos :] + chunk
+        self.base += self.pos
+        self.pos = 0
+        return True
+
+    def _peek(self):
+        """Skip whitespace and return the next byte, ``None`` at the end of
+        the file.
+        """
+        while True:
+            m = WHITESPACE.search(self.buf, self.pos)
+            if m:
+                self.pos = m.start()
+                return self.buf[self.pos : self.pos + 1]
+            self.pos = len(self.buf)
+            if not self._fill():
+                return None
+
+    def _expect(self, chars):
+        char = self._peek()
+        if char is None or char not in chars:
+            raise InvalidJsonDocument(
+                f"expect one of {chars!r} at offset {self.position}, got {char!r}"
+            )
+        self.pos += 1
+        return char
+
+    def _next_element(self):
+        """Move to the start of the next element, return ``False`` once the
+        end of the array is reached.
+        """
+        if self.done:
+            return False
+        if self.first:
+            self.first = False
+            if self._peek() != b"]":
+                return True
+        if self._expect(b",]") == b"]":
+            self.done = True
+            return False
+        self._peek()
+        return True
+
+    def _enter_array(self):
+        for key in self.path:
+            self._expect(b"{")
+            char = self._peek()
+            while char != b"}":
+                end = self._scan_value(keep=True)
+                name = json.loads(self.buf[self.pos : end])
+                self.pos = end
+                self._expect(b":")
+                if name == key:
+                    break
+                self._peek()
+                self.pos = self._scan_value(keep=False)
+                char = self._expect(b",}")
+                self._peek()
+            else:
+                raise InvalidJsonDocument(f"key {key!r} not found")
+        self._expect(b"[")
+
+    def _scan_value(self, keep):
+        """Return the index right after the JSON value starting at
+        ``self.pos``, reading more of the file as needed. With ``keep`` set,
+        the value starts at ``self.pos`` still once it returns; otherwise the
+        bytes already scanned are dropped from the buffer.
+        """
+        first = self.buf[self.pos : self.pos + 1]
+        if first not in (b"{", b"[", b'"'):
+            return self._scan_scalar(keep)
+
+        depth = 0
+        in_string = False
+        index = self.pos
+        while True:
+            if in_string:
+                m = STRING_SPECIAL.search(self.buf, index)
+                if m and m.group() == b"\\":
+                    # the escaped byte may still be in the file
+                    if m.end() < len(self.buf):
+                        index = m.end() + 1
+                        continue
+                elif m:
+                    in_string = False
+                    index = m.end()
+                    if depth == 0:
+                        return index
+                    continue
+            else:
+                m = STRUCTURE.search(self.buf, index)
+                if m:
+                    index = m.end()
+                    char = m.group()
+                    if char == b'"':
+                        in_string = True
+                    elif char in b"[{":
+                        depth += 1
+                    else:
+                        depth -= 1
+                        if depth == 0:
+                            return index
+                    continue
+
+            # reached the end of the buffer in the middle of the value
+            index = m.start() if m else len(self.buf)
+            if not keep:
+                self.pos = index
+            index -= self.pos
+            if not self._fill():
+                raise InvalidJsonDocument("unexpected end of file")
+            index += self.pos
+
+    def _scan_scalar(self, keep):
+        index = self.pos
+        while True:
+            m = SCALAR_END.search(self.buf, index)
+            if m:
+                return m.start()
+            index = len(self.buf)
+            if not keep:
+                self.pos = index
+            index -= self.pos
+            if not self._fill():
+                return len(self.buf)
+            index += self.pos
+
+
+def batch_read_json_array(n, f_obj, path=None, start=0, resume=False):
+    """Read the elements of a JSON array in batches of ``n``.
+
+    Yields the same ``(count, offset, batch)`` tuples as
+    :func:`porter.utils.batch_read_lines`, with undecoded elements in place of
+    lines.
+    """
+    scanner = JsonArrayScanner(f_obj, path=path, resume=resume)
+    count = start
+    while True:
+        batch = scanner.read(n)
+        if not batch:
+            break
+        count += len(batch)
+        yield count, scanner.offset, batch
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import zlib
+
+
+class Partitioner:
+    """Spread the records of a task over ``count`` queues, named after the
+    queue key followed by ``.<index>``.
+
+    Records go to the partition given by the CRC32 of their ``field``, so
+    that the records sharing a value always land in the same queue, or in
+    turn to every partition without ``field``.
+
+    :param count: number of partitions.
+    :param field: field of the records to hash, round robin if ``None``.
+    """
+
+    def __init__(self, count, field=None):
+        self.count = count
+        self.field = field
+        self._next = 0
+
+    def keys(self, key):
+        """Return the queue keys of the partitions of the queue ``key``."""
+        return [f"{key}.{index}" for index in range(self.count)]
+
+    def index(self, record):
+        value = record.get(self.field) if isinstance(record, dict) else None
+        if not isinstance(value, bytes):
+            value = str(value).encode("utf8")
+        return zlib.crc32(value) % self.count
+
+    def split(self, records, elements):
+        """Group the encoded ``elements`` of ``records`` by partition index,
+        hashing the records, or in turn without field.
+        """
+        if self.field is None:
+            return self.round_robin(elements)
+        batches = {}
+        for record, element in zip(records, elements):
+            batches.setdefault(self.index(record), []).append(element)
+        return batches
+
+    def round_robin(self, elements):
+        start, self._next = self._next, (self._next + len(elements)) % self.count
+        batches = {}
+        for offset in range(min(self.count, len(elements))):
+            batches[(start + offset) % self.count] = elements[offset :: self.count]
+        return batches
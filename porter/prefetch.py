@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import logging
+import threading
+import time
+from queue import Empty, Full, Queue
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+class _Raised:
+    def __init__(self, error):
+        self.error = error
+
+
+class Prefetcher:
+    """Iterate over the batches of ``iterable`` in a background thread, up
+    to ``depth`` batches ahead of the consumer, so that the source is read
+    while the previous batches are being pushed.
+
+    The time spent in each stage is measured: ``fetch_time`` producing the
+    batches, ``push_time`` consuming them, ``wait_time`` waiting for a batch
+    to be fetched, and ``stall_time`` waiting for the consumer to make room.
+    An error of the source is raised to the consumer, and the source is
+    closed when the consumer stops early.
+
+    :param iterable: batches to prefetch, typically a generator of pages.
+    :param depth: maximum number of batches fetched and not consumed yet.
+    """
+
+    def __init__(self, iterable, depth=1):
+        self.iterable = iterable
+        self.depth = max(depth, 1)
+        self.fetch_time = 0.0
+        self.push_time = 0.0
+        self.wait_time = 0.0
+        self.stall_time = 0.0
+
+    def __iter__(self):
+        queue = Queue(maxsize=self.depth)
+        stop = threading.Event()
+        thread = threading.Thread(
+            target=self._fetch, args=(queue, stop), name="porter-prefetch", daemon=True
+        )
+        thread.start()
+        try:
+            while True:
+                start = time.perf_counter()
+                item = queue.get()
+                self.wait_time += time.perf_counter() - start
+                if item is _DONE:
+                    return
+                if isinstance(item, _Raised):
+                    raise item.error
+                start = time.perf_counter()
+                yield item
+                self.push_time += time.perf_counter() - start
+        finally:
+            stop.set()
+            while thread.is_alive():
+                try:
+                    queue.get_nowait()
+                except Empty:
+                    thread.join(0.1)
+
+    def stats(self):
+        return {
+            "fetch": self.fetch_time,
+            "push": self.push_time,
+            "wait": self.wait_time,
+            "stall": self.stall_time,
+        }
+
+    def _fetch(self, queue, stop):
+        items = iter(self.iterable)
+        try:
+            while not stop.is_set():
+                start = time.perf_counter()
+                try:
+                    item = next(items)
+                except StopIteration:
+                    item = _DONE
+                self.fetch_time += time.perf_counter() - start
+                if not self._put(queue, item, stop) or item is _DONE:
+                    return
+        except BaseException as e:
+            self._put(queue, _Raised(e), stop)
+        finally:
+            if hasattr(items, "close"):
+                items.close()
+
+    def _put(self, queue, item, stop):
+        start = time.perf_counter()
+        try:
+            while not stop.is_set():
+                try:
+                    queue.put(item, timeout=0.1)
+                    return True
+                except Full:
+                    continue
+            return False
+        finally:
+            self.stall_time += time.perf_counter() - start
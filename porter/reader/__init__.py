@@ -1,4 +1,5 @@
 from porter.reader.filereader import FileReader
 from porter.reader.jsonreader import JsonReader
 from porter.reader.mysqlreader import MySQLReader
+from porter.reader.mysqldatabasereader import MySQLDatabaseReader
 from porter.reader.mongoreader import MongoReader
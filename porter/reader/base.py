@@ -1,39 +1,512 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor
 
-from porter.backends.redisqueue import RedisQueue
+from porter.backends.connection import pool_stats
+from porter.backends.redisqueue import PENDING_FIELD, RedisQueue
 from porter.backends.rediscache import RedisCache
+from porter.backends.redisstream import RedisStream
+from porter.backpressure import Backpressure
+from porter.exceptions import InvalidConfiguration
+from porter.partition import Partitioner
+from porter.prefetch import Prefetcher
+from porter.transform import Transform
+from porter.utils import (
+    batch_read_lines,
+    count_lines,
+    file_fingerprint,
+    skip_lines,
+    split_file,
+)
+
+logger = logging.getLogger(__name__)
+
+TOTAL_STRATEGIES = ("exact", "estimated", "pk_range", "lazy")
 
 
 class BaseReader:
-    def __init__(self, redis_config, limit=1000, scale=3, block=True, sleep=10):
+    def __init__(
+        self, redis_config, limit=1000, scale=3, block=True, sleep=10, workers=1
+    ):
+        self.redis_config = dict(redis_config)
         self.queue_key_prefix = redis_config.pop("queue_key_prefix", "porter.queue")
         self.cache_key_prefix = redis_config.pop("cache_key_prefix", "porter.cache")
         self.queue_key = self.cache_key = redis_config.pop("key")
+        backpressure = redis_config.pop("backpressure", None) or {}
+        codec = redis_config.pop("codec", None)
+        envelope = redis_config.pop("envelope", None) or {}
+        queue_type = redis_config.pop("queue", None) or "list"
+        stream = redis_config.pop("stream", None) or {}
+        partitions = redis_config.pop("partitions", None) or {}
+        chunk = redis_config.pop("chunk", None) or {}
         self.limit = limit
         self.scale = scale
         self.block = block
         self.sleep = sleep
+        self.workers = workers
+        # batches read ahead of the pushes, 0 to read and push in turn
+        self.prefetch = 0
+        self.prefetcher = None
+        # how the readers of databases count the records to sync
+        self.total_strategy = "exact"
+        # the queue length counts envelopes, the watermarks count records
+        enveloped = envelope.get("enabled") or False
+        chunk_records = chunk.get("records") or 1000
+        per_element = 1
+        if enveloped:
+            per_element = min(envelope.get("records") or limit, chunk_records)
+        high = max(limit * scale // per_element, 1)
+        low = backpressure.get("low_watermark")
+        socket_timeout = redis_config.get("socket_timeout")
+        if backpressure.get("wakeup") and socket_timeout and socket_timeout <= sleep:
+            # the wakeup signal is waited for with BLPOP up to sleep seconds
+            raise InvalidConfiguration(
+                f"redis.socket_timeout ({socket_timeout}s) must exceed "
+                f"the sleep interval ({sleep}s) when backpressure wakeup is on"
+            )
+
         self.cache = RedisCache(key_prefix=self.cache_key_prefix, **redis_config)
-        self.queue = RedisQueue(key_prefix=self.queue_key_prefix, **redis_config)
+        queue_options = dict(
+            key_prefix=self.queue_key_prefix,
+            codec=codec,
+            envelope=enveloped,
+            envelope_records=envelope.get("records"),
+            compression=envelope.get("compression"),
+            chunk_records=chunk_records,
+            chunk_bytes=chunk.get("bytes") or 1 << 20,
+            **redis_config,
+        )
+        if queue_type == "list":
+            self.queue = RedisQueue(**queue_options)
+        elif queue_type == "stream":
+            # trim consumed entries only, the backlog being capped at high
+            maxlen = stream.get("maxlen")
+            if maxlen is None and block:
+                maxlen = high + -(-limit // per_element)
+            self.queue = RedisStream(maxlen=maxlen, **queue_options)
+        else:
+            raise InvalidConfiguration(f"unknown queue type: {queue_type}")
+        self.partitioner = None
+        self.queue_keys = [self.queue_key]
+        if (partitions.get("count") or 1) > 1:
+            self.partitioner = Partitioner(partitions["count"], partitions.get("field"))
+            self.queue_keys = self.partitioner.keys(self.queue_key)
+        self.backpressures = {
+            key: Backpressure(
+                self.queue,
+                key,
+                high=high,
+                low=low if low is None else low // per_element,
+                min_interval=backpressure.get("min_interval") or 0.01,
+                max_interval=sleep,
+                wakeup=backpressure.get("wakeup") or False,
+            )
+            for key in self.queue_keys
+        }
+
+    @property
+    def maxlen(self):
+        """Length of a queue from which pushes are refused, 0 for never."""
+        return self.backpressures[self.queue_keys[0]].high if self.block else 0
+
+    @property
+    def throttled(self):
+        """Time spent waiting for consumers, in seconds."""
+        return sum(b.throttled for b in self.backpressures.values())
+
+    @property
+    def throttles(self):
+        return sum(b.throttles for b in self.backpressures.values())
+
+    def log_stats(self):
+        """Log the time spent throttled and the use of the connection pools."""
+        logger.info(
+            f"throttled for {self.throttled:.3f}s " f"in {self.throttles} waits"
+        )
+        for stats in pool_stats():
+            logger.info(
+                f"connection pool {stats['endpoint']}: {stats['created']} "
+                f"connections created, {stats['in_use']} in use, "
+                f"max {stats['max_connections']}"
+            )
+        if self.prefetcher is not None:
+            stats = self.prefetcher.stats()
+            logger.info(
+                f"fetched for {stats['fetch']:.3f}s, pushed for {stats['push']:.3f}s, "
+                f"waited {stats['wait']:.3f}s for fetches "
+                f"and {stats['stall']:.3f}s for pushes"
+            )
+
+    def prefetched(self, batches):
+        """Read ``batches`` in a background thread, up to ``prefetch`` of them
+        ahead of the pushes, unless ``prefetch`` is 0.
+        """
+        if not self.prefetch:
+            return batches
+        self.prefetcher = Prefetcher(batches, self.prefetch)
+        return self.prefetcher
 
     def sync(self):
         pass
 
-    def push(self, *records):
-        pass
+    def push(self, values, checkpoint=None, pending_field=PENDING_FIELD):
+        """Push a batch of ``values`` together with its ``checkpoint`` in a
+        single atomic call. In blocking mode, pushes are refused while the
+        queue holds ``limit * scale`` elements or more, and the
+        :class:`Backpressure` controller waits for consumers to drain it.
+
+        With partitions, every partition gets its share of the batch in a
+        single pipeline and is throttled on its own; the checkpoint is only
+        stored once all of them were pushed.
+
+        ``pending_field`` is the checkpoint field counting the values of the
+        batch pushed so far, see :meth:`RedisQueue.push_checkpoint`.
+        """
+        values = self.serialize(values) if values else []
+        if not values and not checkpoint:
+            return
+        if self.partitioner is not None:
+            return self._push_partitions(values, checkpoint)
+
+        backpressure = self.backpressures[self.queue_key]
+        while True:
+            length = self.queue.push_checkpoint(
+                self.queue_key,
+                values,
+                self.cache,
+                self.cache_key,
+                mapping=checkpoint,
+                maxlen=self.maxlen,
+                pending_field=pending_field,
+            )
+            if length >= 0:
+                logger.debug(f"cache checkpoint: {checkpoint}")
+                return length
+            waited = backpressure.wait()
+            logger.debug(f"throttled for {waited:.3f}s")
+            checkpoint = dict(checkpoint or {}, throttled=self.throttled)
+
+    def _push_partitions(self, values, checkpoint):
+        if not isinstance(values, dict):
+            values = self.partitioner.round_robin(values)
+        pending = {self.queue_keys[index]: batch for index, batch in values.items()}
+        throttled = self.throttled
+        while pending:
+            lengths = self.queue.push_partitions(pending, maxlen=self.maxlen)
+            pending = {key: pending[key] for key, n in lengths.items() if n < 0}
+            for key in pending:
+                waited = self.backpressures[key].wait()
+                logger.debug(f"{key} throttled for {waited:.3f}s")
+
+        if checkpoint:
+            if self.throttled > throttled:
+                checkpoint = dict(checkpoint, throttled=self.throttled)
+            self.cache.setmany(self.cache_key, mapping=checkpoint)
+            logger.debug(f"cache checkpoint: {checkpoint}")
+
+    def serialize(self, values):
+        """Turn a batch read from the source into a list of queue elements.
+        With partitions keyed by a field, the elements are grouped in a dict
+        by partition index instead.
+        """
+        if self.partitioner is None or self.partitioner.field is None:
+            return self.queue.dump_objects(values)
+        values = list(values)
+        return self.partitioner.split(values, self.queue.dump_objects(values))
 
     def status(self):
-        pass
+        status = self.format_status(self.cache.getall(self.cache_key))
+        if self.partitioner is not None:
+            status["partitions"] = {key: self.queue.len(key) for key in self.queue_keys}
+        return status
+
+    def format_status(self, checkpoint):
+        """Build the status reported by ``monitor`` out of the checkpoint
+        hash of the task, as returned by :meth:`RedisCache.getall`.
+        """
+        return checkpoint
 
     def clear(self, cache):
         if cache == "status":
             self.cache.delete(self.cache_key)
         elif cache == "queue":
-            self.queue.delete(self.queue_key)
+            self.queue.delete_many(*self.queue_keys)
         else:
             self.cache.delete(self.cache_key)
-            self.queue.delete(self.queue_key)
+            self.queue.delete_many(*self.queue_keys)
 
     def count(self):
         pass
+
+    def count_total(self):
+        """Count the records of the source with :meth:`count`, unless the
+        ``total`` strategy is ``lazy``: the total is then counted exactly by
+        a background thread while the sync runs, and ``None`` until known.
+        """
+        if self.total_strategy != "lazy":
+            return self.count()
+        threading.Thread(
+            target=self._count_lazily, name="porter-count", daemon=True
+        ).start()
+        return None
+
+    def _count_lazily(self):
+        try:
+            total = self.lazy_count()
+        except Exception:
+            logger.exception("failed to count the records")
+            return
+        logger.info(f"counted {total} records")
+        self.total = total
+        self.cache.set(self.cache_key, "total", total)
+
+    def lazy_count(self):
+        """Count the records exactly from a background thread."""
+        return self.count()
+
+    def check_total_strategy(self, strategy):
+        if strategy not in TOTAL_STRATEGIES:
+            raise InvalidConfiguration(f"unknown total strategy: {strategy}")
+        return strategy
+
+    @staticmethod
+    def _range_fields(ranges):
+        """Checkpoint fields of the ranges synced in parallel."""
+        return [f"range.{index}" for index in range(len(ranges["ranges"]))]
+
+    @classmethod
+    def _pending_fields(cls, ranges):
+        """Fields counting the values of the batch of every range pushed."""
+        return [cls._pending_field(field) for field in cls._range_fields(ranges)]
+
+    @staticmethod
+    def _pending_field(field):
+        return f"{field}.{PENDING_FIELD}"
+
+
+def _sync_range(reader_class, reader_config, redis_config, options, index, bounds):
+    reader = reader_class(reader_config, redis_config, **options)
+    reader.sync_range(index, *bounds)
+
+
+class BaseFileReader(BaseReader):
+    """Reader for line based text files.
+
+    Checkpoints record the number of lines pushed together with the byte
+    offset right after the last pushed batch and a fingerprint of the file,
+    so that a resumed sync can :meth:`seek` straight to where it stopped.
+    The line count of the file is cached under the same fingerprint.
+
+    With ``workers`` greater than 1 the rest of the file is split into
+    newline aligned byte ranges, each one pushed by a process of its own and
+    checkpointed in its own ``range.<index>`` field.
+    """
+
+    header_lines = 0
+
+    def __init__(
+        self,
+        file_config,
+        redis_config,
+        limit=1000,
+        scale=3,
+        block=True,
+        sleep=10,
+        workers=1,
+    ):
+        super().__init__(
+            redis_config=redis_config,
+            limit=limit,
+            scale=scale,
+            block=block,
+            sleep=sleep,
+            workers=workers,
+        )
+        self.file_config = dict(file_config)
+        self.file_path = file_config["path"]
+        self.appendices = file_config["appendices"]
+        self.transform = self._transform(file_config)
+        self.count_workers = file_config.get("count_workers") or 1
+        self.total = self.count()
+
+    def sync(self):
+        fingerprint = file_fingerprint(self.file_path)
+        checkpoint = self.cache.getall(self.cache_key)
+        linenum = offset = 0
+        if "count" in checkpoint:
+            linenum = checkpoint["count"] or 0
+            offset = checkpoint.get("offset") or 0
+            if offset and checkpoint.get("fingerprint") != fingerprint:
+                logger.warning(
+                    f"{self.file_path} changed since last checkpoint, "
+                    f"skip to linenum instead of offset"
+                )
+                offset = 0
+            logger.info(
+                f"continue at linenum: \33[0;32m{linenum}\33[0m"
+                f"\toffset: \33[0;32m{offset}\33[0m"
+                f"\ttotal: \33[0;32m{self.total}\33[0m"
+            )
+        else:
+            self.cache.setmany(self.cache_key, mapping={"count": 0, "offset": 0})
+        self.cache.setmany(
+            self.cache_key, mapping={"total": self.total, "fingerprint": fingerprint}
+        )
+
+        ranges = checkpoint.get("ranges")
+        if ranges and ranges["fingerprint"] != fingerprint:
+            logger.warning(f"{self.file_path} changed since split, split again")
+            self.cache.hdel(
+                self.cache_key,
+                self._range_fields(ranges) + self._pending_fields(ranges),
+            )
+            ranges = None
+
+        with open(self.file_path, "rb") as f_obj:
+            logger.info(f"{self.file_path} opened...")
+            self.read_header(f_obj)
+            if offset:
+                f_obj.seek(offset)
+            elif linenum:
+                offset = self.skip_records(f_obj, linenum)
+            else:
+                offset = f_obj.tell()
+
+            if not ranges and self.workers == 1:
+                logger.info("traverse file...")
+                batches = self.read_batches(f_obj, start=linenum, resume=bool(linenum))
+                for i, end, n_lines in batches:
+                    self.push(n_lines, {"count": i, "offset": end})
+
+        if ranges or self.workers > 1:
+            if not ranges:
+                ranges = {
+                    "fingerprint": fingerprint,
+                    "count": linenum,
+                    "ranges": self.split_ranges(offset),
+                }
+                self.cache.set(self.cache_key, "ranges", ranges)
+            self._sync_ranges(ranges)
+            self.cache.hdel(
+                self.cache_key,
+                ["ranges"] + self._range_fields(ranges) + self._pending_fields(ranges),
+            )
+            self.cache.set(self.cache_key, "offset", fingerprint["size"])
+        # complete
+        self.cache.set(self.cache_key, "count", self.total)
+        self.log_stats()
+
+    def _sync_ranges(self, ranges):
+        logger.info(
+            f"traverse {len(ranges['ranges'])} ranges of file "
+            f"with {self.workers} workers..."
+        )
+        options = {
+            "limit": self.limit,
+            "scale": self.scale,
+            "block": self.block,
+            "sleep": self.sleep,
+        }
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            futures = [
+                pool.submit(
+                    _sync_range,
+                    type(self),
+                    self.file_config,
+                    self.redis_config,
+                    options,
+                    index,
+                    bounds,
+                )
+                for index, bounds in enumerate(ranges["ranges"])
+            ]
+            for future in futures:
+                future.result()
+
+    def sync_range(self, index, start, end):
+        """Push the lines within the byte range [``start``, ``end``)."""
+        field = f"range.{index}"
+        checkpoint = self.cache.get(self.cache_key, field) or {
+            "count": 0,
+            "offset": start,
+        }
+        logger.info(
+            f"range {index} [{start}, {end}) continue at "
+            f"offset: \33[0;32m{checkpoint['offset']}\33[0m"
+        )
+        with open(self.file_path, "rb") as f_obj:
+            self.read_header(f_obj)
+            f_obj.seek(checkpoint["offset"])
+            batches = self.read_batches(f_obj, start=checkpoint["count"], end=end)
+            for i, offset, n_lines in batches:
+                self.push(
+                    n_lines,
+                    {field: {"count": i, "offset": offset}},
+                    pending_field=self._pending_field(field),
+                )
+
+    def _transform(self, file_config):
+        return Transform.from_config(file_config)
+
+    def split_ranges(self, start=0):
+        """Split the file from the byte offset ``start`` into ``workers``
+        ranges of whole records.
+        """
+        return split_file(self.file_path, self.workers, start=start)
+
+    def read_header(self, f_obj):
+        """Consume the header, if any, from the beginning of ``f_obj``."""
+        pass
+
+    def read_batches(self, f_obj, start=0, end=None, resume=False):
+        """Read the records of ``f_obj`` in batches of ``limit``, yielding
+        the record count, the byte offset after the batch and the batch.
+        ``resume`` tells that ``f_obj`` was moved past some records already.
+        """
+        return batch_read_lines(self.limit, f_obj, start=start, end=end)
+
+    def skip_records(self, f_obj, n):
+        """Move ``f_obj`` past its first ``n`` records, return the offset."""
+        return skip_lines(f_obj, n)
+
+    def count_records(self):
+        return max(
+            count_lines(self.file_path, self.count_workers) - self.header_lines, 0
+        )
+
+    def count(self):
+        fingerprint = file_fingerprint(self.file_path)
+        cached = self.cache.get(self.cache_key, "linecount")
+        if cached and cached["fingerprint"] == fingerprint:
+            return cached["total"]
+
+        logger.info(f"count lines of {self.file_path}...")
+        total = self.count_records()
+        self.cache.set(
+            self.cache_key,
+            "linecount",
+            {"fingerprint": fingerprint, "total": total},
+        )
+        return total
+
+    def format_status(self, checkpoint):
+        status = {
+            "count": checkpoint.get("count"),
+            "total": checkpoint.get("total"),
+            "offset": checkpoint.get("offset"),
+            "throttled": checkpoint.get("throttled"),
+        }
+        ranges = checkpoint.get("ranges")
+        if ranges:
+            status["ranges"] = []
+            for field, (start, end) in zip(
+                self._range_fields(ranges), ranges["ranges"]
+            ):
+                progress = checkpoint.get(field) or {"count": 0, "offset": start}
+                status["ranges"].append(dict(progress, start=start, end=end))
+            status["count"] = ranges["count"] + sum(
+                r["count"] for r in status["ranges"]
+            )
+        return status
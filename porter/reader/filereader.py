@@ -1,111 +1,120 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
-import codecs
 import logging
-import subprocess
-import sys
-import time
 
-from porter.reader.base import BaseReader
-from porter.utils import batch_read_file
+from porter.csvstream import CsvParser, batch_read_csv, count_csv_records, split_csv
+from porter.exceptions import InvalidConfiguration
+from porter.reader.base import BaseFileReader
+from porter.transform import Transform
 
 logger = logging.getLogger(__name__)
 
 
-class FileReader(BaseReader):
+class FileReader(BaseFileReader):
+    """Reader for delimited text files.
+
+    With ``header`` set, the file is read as RFC 4180 CSV and every record is
+    pushed as a dict keyed by the header; otherwise lines are pushed as they
+    are. The records of a CSV file are counted, and its ranges split, at the
+    line breaks outside quoted fields.
+    """
+
     def __init__(
-        self, file_config, redis_config, limit=1000, scale=3, block=True, sleep=10
+        self,
+        file_config,
+        redis_config,
+        limit=1000,
+        scale=3,
+        block=True,
+        sleep=10,
+        workers=1,
     ):
+        self.delimiter = file_config["delimiter"]
+        self.quotechar = file_config.get("quotechar") or '"'
+        self.parser = CsvParser(delimiter=self.delimiter, quotechar=self.quotechar)
+        self.has_header = file_config["header"]
+        self.header_lines = 1 if self.has_header else 0
+        self.header = None
+        if not self.has_header:
+            if (redis_config.get("partitions") or {}).get("field"):
+                raise InvalidConfiguration(
+                    "partitions.field requires a file with header, "
+                    "lines without header have no fields"
+                )
+            redis_config = dict(redis_config, codec="raw")
         super().__init__(
+            file_config=file_config,
             redis_config=redis_config,
             limit=limit,
             scale=scale,
             block=block,
             sleep=sleep,
+            workers=workers,
         )
-        self.file_path = file_config["path"]
-        self.delimiter = file_config["delimiter"]
-        self.has_header = file_config["header"]
-        self.appendices = file_config["appendices"]
-        self.header = None
-        self.total = self.cache.get(self.cache_key, "total") or self.count()
 
-    def sync(self):
-        def _wait_for_push(bulks):
-            while True:
-                # non-block, no resumption
-                if not self.block:
-                    self.push(bulks)
-                    break
-                else:
-                    # enable block mode
-                    if self.queue.len(self.cache_key) >= self.limit * self.scale:
-                        logger.debug(f"wait for {self.sleep}s...")
-                        time.sleep(self.sleep)
-                    else:
-                        self.push(bulks)
-                        logger.debug(f"cache linenum: {i}")
-                        self.cache.set(self.cache_key, "count", i)
-                        break
+    def _transform(self, file_config):
+        if not self.has_header:
+            # raw lines only get the appendices, as they are, appended
+            return Transform()
+        return super()._transform(file_config)
 
-        linenum = 0
-        if self.cache.exists(self.cache_key):
-            linenum = self.cache.get(self.cache_key, "count")
-            logger.info(
-                f"continue at linenum: \33[0;32m{linenum}\33[0m"
-                f"\ttotal: \33[0;32m{self.total}\33[0m"
-            )
-
-        with codecs.open(self.file_path, encoding="utf8") as f_obj:
-            logger.info(f"{self.file_path} opened...")
-            logger.debug(f"has header: {self.has_header}")
-            if self.has_header:
-                self.header = f_obj.readline().rstrip("\n").split(self.delimiter)
-                logger.info("header: {}".format(self.header))
-            if linenum:
-                for i, n_lines in batch_read_file(self.limit, f_obj):
-                    # skip line has pushed
-                    if i + 1 < linenum:
-                        continue
-                    _wait_for_push(n_lines)
+    def read_header(self, f_obj):
+        logger.debug(f"has header: {self.has_header}")
+        if self.has_header:
+            line = f_obj.readline().rstrip(b"\n").rstrip(b"\r")
+            self.header = tuple(self.parser.parse(line))
+            logger.info("header: {}".format(self.header))
 
-            else:
-                self.cache.setmany(
-                    self.cache_key, mapping={"total": self.total, "count": 0}
-                )
-                logger.info("traverse file...")
-                for i, n_lines in batch_read_file(self.limit, f_obj):
-                    _wait_for_push(n_lines)
-        # complete
-        self.cache.set(self.cache_key, "count", self.total)
+    def read_batches(self, f_obj, start=0, end=None, resume=False):
+        if not self.has_header:
+            return super().read_batches(f_obj, start=start, end=end, resume=resume)
+        return batch_read_csv(
+            self.limit, f_obj, quotechar=self.quotechar, start=start, end=end
+        )
 
-    def append(self, values):
-        for v in values:
-            for a in self.appendices:
-                if self.has_header:
-                    key, val = a.split(":")
-                    v[key] = val
-                else:
-                    v = f"{v}{self.delimiter}{a}"
-            yield v
+    def split_ranges(self, start=0):
+        if not self.has_header:
+            return super().split_ranges(start)
+        return split_csv(
+            self.file_path, self.workers, start=start, quotechar=self.quotechar
+        )
 
-    def push(self, values):
-        if self.has_header:
-            values = (
-                dict(zip(self.header, line.rstrip("\n").split(self.delimiter)))
-                for line in values
-            )
-        else:
-            values = (line.rstrip("\n") for line in values)
-        values = self.append(values)
-        self.queue.push(self.queue_key, values)
+    def count_records(self):
+        if not self.has_header:
+            return super().count_records()
+        count = count_csv_records(self.file_path, quotechar=self.quotechar)
+        return max(count - self.header_lines, 0)
 
-    def count(self):
-        # exclude header line
-        with codecs.open(self.file_path, encoding="utf8") as fd:
-            return sum(1 for _ in fd) - 1
+    def skip_records(self, f_obj, n):
+        if not self.has_header:
+            return super().skip_records(f_obj, n)
+        count, offset = 0, f_obj.tell()
+        for i, end, _ in batch_read_csv(self.limit, f_obj, quotechar=self.quotechar):
+            if i > n:
+                break
+            count, offset = i, end
+        while count < n:
+            # the n-th record lies within the last batch read, which may hold
+            # fewer than n - count records when quoted fields span lines
+            f_obj.seek(offset)
+            for i, offset, _ in batch_read_csv(
+                n - count, f_obj, quotechar=self.quotechar
+            ):
+                count += i
+                break
+            else:
+                break
+        f_obj.seek(offset)
+        return offset
 
-    def status(self):
-        count = self.cache.get(self.cache_key, "count")
-        total = self.cache.get(self.cache_key, "total")
-        return {"count": count, "total": total}
+    def serialize(self, values):
+        if self.has_header:
+            header = self.header
+            values = (dict(zip(header, row)) for row in self.parser.parse_many(values))
+            return super().serialize(self.transform(values))
+        # raw lines go to redis without being decoded
+        if self.appendices:
+            suffix = "".join(f"{self.delimiter}{a}" for a in self.appendices)
+            suffix = suffix.encode("utf8")
+            values = [line + suffix for line in values]
+        return values
@@ -1,101 +1,69 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
-import codecs
 import json
 import logging
-import subprocess
-import sys
-import time
 
-from porter.reader.base import BaseReader
-from porter.utils import batch_read_file
+from porter.exceptions import InvalidConfiguration
+from porter.jsonstream import JsonArrayScanner, batch_read_json_array
+from porter.reader.base import BaseFileReader
 
 logger = logging.getLogger(__name__)
 
 
-class JsonReader(BaseReader):
+class JsonReader(BaseFileReader):
+    """Reader for JSON files, either newline delimited (``format: lines``)
+    or holding one array, at the top level or at the dotted ``json_path``
+    (``format: array``).
+    """
+
     def __init__(
-        self, json_config, redis_config, limit=1000, scale=3, block=True, sleep=10
+        self,
+        json_config,
+        redis_config,
+        limit=1000,
+        scale=3,
+        block=True,
+        sleep=10,
+        workers=1,
     ):
+        self.format = json_config.get("format") or "lines"
+        if self.format not in ("lines", "array"):
+            raise InvalidConfiguration(f"unknown json format: {self.format}")
+        self.json_path = json_config.get("json_path")
+        if self.format == "array" and workers > 1:
+            logger.warning("JSON arrays cannot be split, fall back to 1 worker")
+            workers = 1
         super().__init__(
+            file_config=json_config,
             redis_config=redis_config,
             limit=limit,
             scale=scale,
             block=block,
             sleep=sleep,
+            workers=workers,
         )
-        self.file_path = json_config["path"]
-        self.appendices = json_config["appendices"]
-        self.total = self.cache.get(self.cache_key, "total") or self.count()
-
-    def sync(self):
-        def _wait_for_push(bulks):
-            while True:
-                # non-block, no resumption
-                if not self.block:
-                    self.push(bulks)
-                    break
-                else:
-                    # enable block mode
-                    if self.queue.len(self.cache_key) >= self.limit * self.scale:
-                        logger.debug(f"wait for {self.sleep}s...")
-                        time.sleep(self.sleep)
-                    else:
-                        self.push(bulks)
-                        logger.debug(f"cache linenum: {i}")
-                        self.cache.set(self.cache_key, "count", i)
-                        break
-
-        linenum = 0
-        if self.cache.exists(self.cache_key):
-            linenum = self.cache.get(self.cache_key, "count")
-            logger.info(
-                f"continue at lineunm: \33[0;32m{linenum}\33[0m"
-                f"\ttotal: \33[0;32m{self.total}\33[0m"
-            )
 
-        with codecs.open(self.file_path, encoding="utf8") as f_obj:
-            logger.info(f"{self.file_path} opened...")
-            if linenum:
-                for i, n_lines in batch_read_file(self.limit, f_obj):
-                    # skip line has pushed
-                    if i + 1 < linenum:
-                        continue
-                    _wait_for_push(n_lines)
+    def read_batches(self, f_obj, start=0, end=None, resume=False):
+        if self.format == "lines":
+            return super().read_batches(f_obj, start=start, end=end, resume=resume)
+        return batch_read_json_array(
+            self.limit, f_obj, path=self.json_path, start=start, resume=resume
+        )
 
-            else:
-                self.cache.setmany(
-                    self.cache_key, mapping={"total": self.total, "count": 0}
-                )
-                logger.info("traverse file...")
-                for i, n_lines in batch_read_file(self.limit, f_obj):
-                    _wait_for_push(n_lines)
-        # complete
-        self.cache.set(self.cache_key, "count", self.total)
+    def skip_records(self, f_obj, n):
+        if self.format == "lines":
+            return super().skip_records(f_obj, n)
+        scanner = JsonArrayScanner(f_obj, path=self.json_path)
+        scanner.skip(n)
+        f_obj.seek(scanner.offset)
+        return scanner.offset
 
-    def append(self, values):
-        for v in values:
-            for a in self.appendices:
-                key, val = a.split(":")
-                v[key] = val
-            yield v
+    def count_records(self):
+        if self.format == "lines":
+            return super().count_records()
+        with open(self.file_path, "rb") as f_obj:
+            return JsonArrayScanner(f_obj, path=self.json_path).skip()
 
-    def push(self, values):
+    def serialize(self, values):
         values = (json.loads(line) for line in values)
-        values = self.append(values)
-        self.queue.push(self.queue_key, values)
-
-    def count(self):
-        if sys.platform.startswith("win"):
-            with codecs.open(self.file_path, encoding="utf8") as fd:
-                return sum(1 for _ in fd)
-        else:
-            cmd = ["wc", "-l", self.file_path]
-            out = subprocess.check_output(cmd)
-            count, _ = out.split(b" ")
-            return int(count)
-
-    def status(self):
-        count = self.cache.get(self.cache_key, "count")
-        total = self.cache.get(self.cache_key, "total")
-        return {"count": count, "total": total}
+        return super().serialize(self.transform(values))
@@ -1,19 +1,34 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 import logging
-import time
 
 from porter.dbproviders.mongo import Mongo
 from porter.reader.base import BaseReader
+from porter.transform import Transform
 
+from bson import json_util
 from bson.objectid import ObjectId
 
 logger = logging.getLogger(__name__)
 
 
 class MongoReader(BaseReader):
+    """Reader for MongoDB collections, walked in ``_id`` order.
+
+    The ``filter`` query of the task, a document or its extended JSON, is
+    combined with the ``_id`` bound of every page and used to count the
+    documents, and the fields are projected by the server.
+    """
+
     def __init__(
-        self, db_config, redis_config, limit=1000, scale=3, block=True, sleep=10
+        self,
+        db_config,
+        redis_config,
+        limit=1000,
+        scale=3,
+        block=True,
+        sleep=10,
+        workers=1,
     ):
         super().__init__(
             redis_config=redis_config,
@@ -21,6 +36,7 @@ class MongoReader(BaseReader):
             scale=scale,
             block=block,
             sleep=sleep,
+            workers=workers,
         )
         self.db = db_config["db"]
         self.port = db_config["port"]
@@ -29,6 +45,15 @@ class MongoReader(BaseReader):
         self.password = db_config["password"]
         self.columns = db_config["column"] or None
         self.appendices = db_config["appendices"]
+        # fields are projected by the server, only ``_id`` is left to drop
+        self.transform = Transform.from_config(dict(db_config, column=None))
+        self.filter = db_config.pop("filter", None) or {}
+        if isinstance(self.filter, str):
+            self.filter = json_util.loads(self.filter)
+        self.prefetch = db_config.pop("prefetch", 0) or 0
+        self.total_strategy = self.check_total_strategy(
+            db_config.pop("total", None) or "exact"
+        )
         self._client = Mongo(**db_config)
         self.total = 0
 
@@ -36,77 +61,80 @@ class MongoReader(BaseReader):
         self._migrate()
 
     def _migrate(self):
-        page = self.cache.get(self.cache_key, "page") or 0
-        count = self.cache.get(self.cache_key, "count") or 1
-        self.total = self.cache.get(self.cache_key, "total") or self.count()
+        page, count, total, last_id = self.cache.getmany(
+            self.cache_key, ["page", "count", "total", "_id"]
+        )
+        page = page or 0
+        count = count or 0
+        self.total = total or self.count_total()
+        if last_id:
+            last_id = ObjectId(last_id)
         logger.info(
             f"continue at page: \33[0;32m{page}\33[0m\tcount: \33[0;32m{count}\33[0m"
         )
 
-        while count < self.total:
-            if self.block:
-                if self.queue.len(self.queue_key) >= self.limit * self.scale:
-                    logger.debug(f"wait for {self.sleep}s...")
-                    time.sleep(self.sleep)
-                    continue
-
-            self.push(self._extract())
-            logger.debug(f"{self.limit} records pushed")
-            count += self.limit
+        for records, last_id in self.prefetched(self._pages(last_id)):
+            count += len(records)
             page += 1
-            self.cache.setmany(
-                self.cache_key,
-                mapping={"page": page, "count": count, "total": self.total},
-            )
+            checkpoint = {
+                "page": page,
+                "count": count,
+                "total": self.total,
+                "record": dict(records[-1]),
+                "_id": str(last_id),
+            }
+            self.push(records, checkpoint)
+            logger.debug(f"{len(records)} records pushed")
 
         logger.info(f"complete migration for {self.db}.{self.collection}, clean cache")
+        self.log_stats()
         self.cache.hdel(self.cache_key, ["count", "page", "total", "record", "_id"])
         self._client.close()
 
-    def _extract(self):
-        last_id = self.cache.get(self.cache_key, "_id")
-        if last_id:
-            last_id = ObjectId(last_id)
-        records, last_id = self._client.pagination(
-            page_size=self.limit, last_id=last_id, fields=self.columns
+    def _pages(self, last_id=None):
+        """Yield the documents a page at a time, with the ``_id`` to resume
+        after, until the collection is exhausted.
+        """
+        while True:
+            records, last_id = self._extract(last_id)
+            if not records:
+                return
+            yield records, last_id
+            if len(records) < self.limit:
+                return
+
+    def _extract(self, last_id=None):
+        return self._client.pagination(
+            page_size=self.limit,
+            last_id=last_id,
+            fields=self.columns,
+            filter=self.filter,
         )
-        if records:
-            self.cache.set(self.cache_key, "record", records[-1])
-            self.cache.set(self.cache_key, "_id", str(last_id))
-        return records
 
     def count(self):
-        return self._client.collection.find().count()
-
-    def append(self, values):
-        for v in values:
-            for a in self.appendices:
-                key, val = a.split(":")
-                v[key] = val
-            yield v
-
-    def filter(self, values):
-        if not self.columns:
-            return values
-
-        columns = set(self.columns)
-        return ({k: v for k, v in val.items() if k in columns} for val in values)
-
-    def push(self, values):
-        if values:
-            values = self.append(self.filter(values))
-            self.queue.push(self.queue_key, values)
-
-    def status(self):
-        count = self.cache.get(self.cache_key, "count")
-        page = self.cache.get(self.cache_key, "page")
-        record = self.cache.get(self.cache_key, "record")
-        object_id = self.cache.get(self.cache_key, "_id")
+        """Count the documents with the ``total`` strategy: ``estimated`` (or
+        ``pk_range``, ObjectIds having no span) reads the collection metadata,
+        ``exact`` or ``lazy`` counts the documents matching ``filter``, as do
+        the estimates of a filtered collection.
+        """
+        if self.total_strategy in ("estimated", "pk_range") and not self.filter:
+            return self._client.collection.estimated_document_count()
+        return self._client.collection.count_documents(self.filter)
+
+    def serialize(self, values):
+        if self.columns and "_id" not in self.columns:
+            # fetched for the pagination only
+            for value in values:
+                value.pop("_id", None)
+        return super().serialize(self.transform(values))
+
+    def format_status(self, checkpoint):
         return {
             "db": self.db,
             "collection": self.collection,
-            "count": count,
-            "page": page,
-            "_id": object_id,
-            "record": record,
+            "count": checkpoint.get("count"),
+            "page": checkpoint.get("page"),
+            "_id": checkpoint.get("_id"),
+            "record": checkpoint.get("record"),
+            "throttled": checkpoint.get("throttled"),
         }
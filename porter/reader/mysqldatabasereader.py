@@ -0,0 +1,242 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import fnmatch
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from porter.dbproviders.mysql import MySQL
+from porter.exceptions import PorterException
+from porter.reader.base import BaseReader
+from porter.reader.mysqlreader import MySQLReader
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# table reader of the worker process, reused from one table to the next
+_worker = {}
+
+
+def _init_worker(reader_config, redis_config, options):
+    _worker.update(config=reader_config, redis_config=redis_config, options=options)
+
+
+def _sync_table(table, pk, cache_key, state_key, state_field):
+    reader = _worker.get("reader")
+    if reader is None:
+        reader = MySQLReader(
+            dict(_worker["config"], table=table, pk=pk),
+            dict(_worker["redis_config"]),
+            **_worker["options"],
+        )
+        _worker["reader"] = reader
+    else:
+        reader.reset(table=table, pk=pk)
+    reader.cache_key = cache_key
+    reader.cache.set(state_key, state_field, {"state": RUNNING})
+    return reader.sync_table()
+
+
+class MySQLDatabaseReader(BaseReader):
+    """Reader for the tables of a MySQL database, synced by a pool of
+    ``workers`` processes, the biggest tables first.
+
+    The tables are those matching one of the ``include`` patterns, all of
+    them if none, and none of the ``exclude`` patterns, shell-style. Their
+    primary keys are read from ``information_schema``, the tables without
+    a single column primary key being skipped. Each process keeps its
+    connection from one table to the next.
+
+    Every table is synced by a :class:`MySQLReader` with the options of the
+    task, into the queue of the task, and checkpointed in a hash of its own,
+    ``<key>.<table>``. The hash of the task records the tables to sync and
+    their state, so that an interrupted sync resumes the tables not done.
+    """
+
+    def __init__(
+        self,
+        db_config,
+        redis_config,
+        limit=1000,
+        scale=3,
+        block=True,
+        sleep=10,
+        workers=1,
+    ):
+        super().__init__(
+            redis_config=redis_config,
+            limit=limit,
+            scale=scale,
+            block=block,
+            sleep=sleep,
+            workers=workers,
+        )
+        self.db_config = dict(db_config)
+        self.db = db_config["db"]
+        self.include = db_config.pop("include", None) or []
+        self.exclude = db_config.pop("exclude", None) or []
+        self._client = MySQL.client(provider="mysql", **db_config)
+
+    def sync(self):
+        tables = self.cache.get(self.cache_key, "tables")
+        if not tables:
+            tables = self.discover()
+            self.cache.setmany(
+                self.cache_key,
+                mapping={
+                    "tables": tables,
+                    **{
+                        self._state_field(t["name"]): {"state": PENDING} for t in tables
+                    },
+                },
+            )
+        self._client.close()
+
+        states = self.cache.getmany(
+            self.cache_key, [self._state_field(t["name"]) for t in tables]
+        )
+        todo = [t for t, s in zip(tables, states) if (s or {}).get("state") != DONE]
+        logger.info(
+            f"sync {len(todo)} of {len(tables)} tables of {self.db} "
+            f"with {self.workers} workers..."
+        )
+        options = {
+            "limit": self.limit,
+            "scale": self.scale,
+            "block": self.block,
+            "sleep": self.sleep,
+        }
+        failed = []
+        with ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_worker,
+            initargs=(self.db_config, self.redis_config, options),
+        ) as pool:
+            futures = {
+                pool.submit(
+                    _sync_table,
+                    table["name"],
+                    table["pk"],
+                    self.table_key(table),
+                    self.cache_key,
+                    self._state_field(table["name"]),
+                ): table
+                for table in todo
+            }
+            for future in as_completed(futures):
+                table = futures[future]
+                try:
+                    count = future.result()
+                except Exception as e:
+                    logger.exception(f"failed to sync {self.db}.{table['name']}")
+                    failed.append(table["name"])
+                    state = {"state": FAILED, "error": str(e)}
+                else:
+                    state = {"state": DONE, "count": count}
+                self.cache.set(self.cache_key, self._state_field(table["name"]), state)
+
+        if failed:
+            raise PorterException(f"failed to sync tables: {', '.join(failed)}")
+        logger.info(f"complete migration for {self.db}, clean cache")
+        self.cache.delete(self.cache_key)
+
+    def discover(self):
+        """Return the tables of the database to sync, with their primary key
+        and estimated number of rows, the biggest first.
+        """
+        escape = self._client.escape
+        rows = self._client.select(
+            f"SELECT TABLE_NAME AS name, TABLE_ROWS AS `rows`, "
+            f"DATA_LENGTH AS size FROM information_schema.TABLES "
+            f"WHERE TABLE_SCHEMA = {escape(self.db)} AND TABLE_TYPE = 'BASE TABLE'"
+        )
+        keys = {}
+        for row in self._client.select(
+            f"SELECT TABLE_NAME AS name, COLUMN_NAME AS pk "
+            f"FROM information_schema.KEY_COLUMN_USAGE "
+            f"WHERE TABLE_SCHEMA = {escape(self.db)} AND CONSTRAINT_NAME = 'PRIMARY'"
+        ):
+            keys.setdefault(row["name"], []).append(row["pk"])
+
+        tables = []
+        for row in rows:
+            name = row["name"]
+            if not self.match(name):
+                continue
+            pk = keys.get(name) or []
+            if len(pk) != 1:
+                logger.warning(f"skip {self.db}.{name}: no single column primary key")
+                continue
+            tables.append(
+                {
+                    "name": name,
+                    "pk": pk[0],
+                    "rows": int(row["rows"] or 0),
+                    "size": int(row["size"] or 0),
+                }
+            )
+        tables.sort(key=lambda t: (t["size"], t["rows"]), reverse=True)
+        return tables
+
+    def match(self, table):
+        """Whether ``table`` is included and not excluded by the patterns."""
+        if self.include and not any(
+            fnmatch.fnmatchcase(table, p) for p in self.include
+        ):
+            return False
+        return not any(fnmatch.fnmatchcase(table, p) for p in self.exclude)
+
+    def table_key(self, table):
+        """Checkpoint key of a table, within the namespace of the task."""
+        return f"{self.cache_key}.{table['name']}"
+
+    @staticmethod
+    def _state_field(name):
+        return f"table.{name}"
+
+    def status(self):
+        """Aggregate the states of the tables and the progress of those
+        being synced.
+        """
+        checkpoint = self.cache.getall(self.cache_key)
+        tables = checkpoint.get("tables") or []
+        progress = self.cache.getall_many([self.table_key(t) for t in tables])
+        status = {
+            "db": self.db,
+            "tables": len(tables),
+            PENDING: 0,
+            RUNNING: 0,
+            DONE: 0,
+            FAILED: 0,
+            "count": 0,
+            "rows": sum(t["rows"] for t in tables),
+            "running_tables": {},
+            "failed_tables": {},
+        }
+        for table, table_checkpoint in zip(tables, progress):
+            name = table["name"]
+            state = checkpoint.get(self._state_field(name)) or {"state": PENDING}
+            status[state["state"]] += 1
+            if state["state"] == DONE:
+                status["count"] += state.get("count") or 0
+            else:
+                status["count"] += table_checkpoint.get("count") or 0
+            if state["state"] == FAILED:
+                status["failed_tables"][name] = state.get("error")
+            elif state["state"] == RUNNING:
+                status["running_tables"][name] = {
+                    "count": table_checkpoint.get("count"),
+                    "total": table_checkpoint.get("total"),
+                    table["pk"]: table_checkpoint.get(table["pk"]),
+                }
+        return status
+
+    def clear(self, cache):
+        if cache != "queue":
+            tables = self.cache.get(self.cache_key, "tables") or self.discover()
+            for table in tables:
+                self.cache.delete(self.table_key(table))
+        super().clear(cache)
@@ -1,18 +1,88 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 import logging
-import time
+from concurrent.futures import ProcessPoolExecutor
 
 from porter.dbproviders.mysql import MySQL
 from porter.exceptions import InvalidConfiguration
-from porter.reader.base import BaseReader
+from porter.reader.base import BaseReader, _sync_range
+from porter.transform import Transform
 
 logger = logging.getLogger(__name__)
 
 
+class RowBatch(list):
+    """Tuple rows of a query, mapped to the fields of the records by the
+    projection that ``transform`` compiled for their columns.
+
+    :param columns: column names of the rows.
+    :param rows: rows, as tuples.
+    :param transform: :class:`Transform` of the records.
+    :param pk: primary key column.
+    :param watermark: watermark column walked before the primary key, if any.
+    """
+
+    def __init__(self, columns, rows, transform, pk, watermark=None):
+        super().__init__(rows)
+        self.names, self._project = transform.project_rows(columns)
+        self.extra = transform.constants
+        self.pk_index = columns.index(pk)
+        self.mark_index = columns.index(watermark) if watermark else None
+
+    def pk(self, index=-1):
+        return self[index][self.pk_index]
+
+    def mark(self, index=-1):
+        """Return the watermark of a row, ``None`` without watermark column."""
+        if self.mark_index is None:
+            return None
+        return self[index][self.mark_index]
+
+    def record(self, index=-1):
+        row = self[index]
+        values = row if self._project is None else self._project(row)
+        return dict(zip(self.names, values), **self.extra)
+
+    def projected(self):
+        """Iterate over the rows reduced to the values of ``names``."""
+        return iter(self) if self._project is None else map(self._project, self)
+
+    def column(self, name):
+        """Return the values of the field ``name`` of the records."""
+        if name in self.extra:
+            return [self.extra[name]] * len(self)
+        if name not in self.names:
+            return [None] * len(self)
+        index = self.names.index(name)
+        return [values[index] for values in self.projected()]
+
+
 class MySQLReader(BaseReader):
+    """Reader for MySQL tables, walked in primary key order.
+
+    With ``workers`` greater than 1 the primary keys are split into ranges,
+    evenly between ``MIN(pk)`` and ``MAX(pk)`` or at quantiles of the keys
+    for skewed or non numeric keys, each one extracted by a process of its
+    own and checkpointed in its own ``range.<index>`` field.
+
+    The ``where`` condition of the task, if any, is added to every query,
+    so that only the matching rows are extracted and counted.
+
+    With a ``watermark`` column the sync is incremental: the position of the
+    last row extracted is kept when a sync completes, and the next one only
+    extracts the rows past it. The rows are walked in ``(watermark, pk)``
+    order, or in primary key order if the watermark is the primary key.
+    """
+
     def __init__(
-        self, db_config, redis_config, limit=1000, scale=3, block=True, sleep=10
+        self,
+        db_config,
+        redis_config,
+        limit=1000,
+        scale=3,
+        block=True,
+        sleep=10,
+        workers=1,
     ):
         super().__init__(
             redis_config=redis_config,
@@ -20,7 +90,9 @@ class MySQLReader(BaseReader):
             scale=scale,
             block=block,
             sleep=sleep,
+            workers=workers,
         )
+        self.db_config = dict(db_config)
         self.db = db_config["db"]
         self.port = db_config["port"]
         self.table = db_config.pop("table")
@@ -31,109 +103,442 @@ class MySQLReader(BaseReader):
             raise InvalidConfiguration(f"Require primary key")
 
         self.columns = db_config.pop("column") or ["*"]
+        self.where = db_config.pop("where", None) or None
+        self.streaming = db_config.pop("streaming", False)
+        self.net_write_timeout = db_config.pop("net_write_timeout", None)
+        self.prefetch = db_config.pop("prefetch", 0) or 0
+        self.total_strategy = self.check_total_strategy(
+            db_config.pop("total", None) or "exact"
+        )
+        self.split = db_config.pop("split", None) or "minmax"
+        if self.split not in ("minmax", "quantile"):
+            raise InvalidConfiguration(f"unknown split method: {self.split}")
+        self.watermark = db_config.pop("watermark", None) or None
         self.append_db_info = db_config["append_db_info"]
         self.appendices = db_config["appendices"]
+        self.transform = self._transform()
         self._client = MySQL.client(provider="mysql", **db_config)
         self.total = 0
+        # position the rows are counted after, ``(pk, watermark)``
+        self.since = None
+
+    @property
+    def mark_column(self):
+        """The watermark column walked before the primary key, if any."""
+        if self.watermark and self.watermark != self.pk:
+            return self.watermark
+        return None
 
     def sync(self):
-        self._migrate()
+        try:
+            self.sync_table()
+        finally:
+            self._client.close()
 
-    def reset(self, db=None, table=None):
+    def sync_table(self):
+        """Sync the table, keeping the connection open for the next one.
+
+        Returns the number of records pushed by the sync.
+        """
+        ranges = self.cache.get(self.cache_key, "ranges")
+        if self.mark_column and (ranges or self.workers > 1):
+            logger.warning(
+                f"ranges split the primary keys, extract {self.table} "
+                f"incrementally by {self.mark_column} with a single worker"
+            )
+            return self._migrate()
+        elif ranges or self.workers > 1:
+            return self._migrate_ranges(ranges)
+        else:
+            return self._migrate()
+
+    def reset(self, db=None, table=None, pk=None):
         if db:
             self.db = db
         if table:
             self.table = table
+        if pk:
+            self.pk = pk
+        self.total = 0
+        self.since = None
+        self.transform = self._transform()
+
+    def _transform(self):
+        constants = {}
+        if self.append_db_info:
+            constants.update(porter_db=self.db, porter_table=self.table)
+        return Transform.from_config(self.db_config, constants)
 
     def _migrate(self):
-        page = self.cache.get(self.cache_key, "page") or 0
-        count = self.cache.get(self.cache_key, "count") or 1
-        self.total = self.cache.get(self.cache_key, "total") or self.count()
+        page, count, total, pk_v, mark = self.cache.getmany(
+            self.cache_key, ["page", "count", "total", self.pk, "watermark"]
+        )
+        page = page or 0
+        count = count or 0
+        if self.watermark and not page:
+            self.since = (pk_v, mark)
+            logger.info(f"extract {self.table} past watermark: {mark or pk_v}")
+        self.total = total or self.count_total()
         logger.info(
             f"continue at page: \33[0;32m{page}\33[0m\tcount: \33[0;32m{count}\33[0m"
         )
 
-        while count < self.total:
-            if self.block:
-                if self.queue.len(self.queue_key) >= self.limit * self.scale:
-                    logger.debug(f"wait for {self.sleep}s...")
-                    time.sleep(self.sleep)
-                    continue
-
-            self.push(self._extract())
-            logger.debug(f"{self.limit} records pushed")
-            count += self.limit
+        if self.streaming:
+            batches = self._stream(pk_v, mark=mark)
+        else:
+            batches = self._pages(pk_v, mark=mark)
+        for records in self.prefetched(batches):
+            count += len(records)
             page += 1
+            pk_v = records.pk()
+            checkpoint = {
+                "page": page,
+                "count": count,
+                "total": self.total,
+                "record": records.record(),
+                self.pk: pk_v,
+            }
+            if self.mark_column:
+                checkpoint["watermark"] = records.mark()
+            self.push(records, checkpoint)
+            logger.debug(f"{len(records)} records pushed")
+
+        self.log_stats()
+        if self.watermark:
+            # keep the position as the watermark of the next sync
+            logger.info(f"complete migration for {self.db}.{self.table}")
+            self.cache.hdel(self.cache_key, ["count", "page", "total", "record"])
+        else:
+            logger.info(f"complete migration for {self.db}.{self.table}, clean cache")
+            self.cache.hdel(
+                self.cache_key, ["count", "page", "total", "record", self.pk]
+            )
+        return count
+
+    def _migrate_ranges(self, ranges=None):
+        if not ranges:
+            count, pk_v = self.cache.getmany(self.cache_key, ["count", self.pk])
+            if self.watermark:
+                self.since = (pk_v, None)
+            self.total = self.count_total()
+            ranges = {"count": count or 0, "ranges": self.split_ranges(pk_v)}
             self.cache.setmany(
+                self.cache_key, mapping={"ranges": ranges, "total": self.total}
+            )
+        logger.info(
+            f"extract {len(ranges['ranges'])} ranges of {self.db}.{self.table} "
+            f"with {self.workers} workers..."
+        )
+        options = {
+            "limit": self.limit,
+            "scale": self.scale,
+            "block": self.block,
+            "sleep": self.sleep,
+        }
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            futures = [
+                pool.submit(
+                    _sync_range,
+                    type(self),
+                    self.db_config,
+                    self.redis_config,
+                    options,
+                    index,
+                    bounds,
+                )
+                for index, bounds in enumerate(ranges["ranges"])
+            ]
+            for future in futures:
+                future.result()
+
+        fields = self._range_fields(ranges)
+        pending = self._pending_fields(ranges)
+        pk_v, *checkpoints = self.cache.getmany(self.cache_key, [self.pk] + fields)
+        count = ranges["count"] + sum(c["count"] for c in checkpoints if c)
+        if self.watermark:
+            # the last range is open above, its position is the highest
+            for checkpoint in checkpoints:
+                if checkpoint and checkpoint.get(self.pk) is not None:
+                    pk_v = checkpoint[self.pk]
+            logger.info(f"complete migration for {self.db}.{self.table}")
+            if pk_v is not None:
+                self.cache.setmany(self.cache_key, mapping={self.pk: pk_v})
+            self.cache.hdel(
                 self.cache_key,
-                mapping={"page": page, "count": count, "total": self.total},
+                ["count", "page", "total", "record", "ranges"] + fields + pending,
             )
+        else:
+            logger.info(f"complete migration for {self.db}.{self.table}, clean cache")
+            self.cache.hdel(
+                self.cache_key,
+                ["count", "page", "total", "record", self.pk, "ranges"]
+                + fields
+                + pending,
+            )
+        return count
 
-        logger.info(f"complete migration for {self.db}.{self.table}, clean cache")
-        self.cache.hdel(self.cache_key, ["count", "page", "total", "record", self.pk])
-        self._client.close()
+    def split_ranges(self, pk_v=None):
+        """Split the primary keys after ``pk_v`` into ``workers`` ranges
+        ``[start, end)``, the first one open below unless resuming after
+        ``pk_v`` and the last one open above, so that rows inserted since
+        are extracted too.
+        """
+        where = self._where(
+            f"{self.pk} > {self._client.escape(pk_v)}" if pk_v else None
+        )
+        ret = self._client.select(
+            f"SELECT MIN({self.pk}) AS lo, MAX({self.pk}) AS hi "
+            f"FROM {self.table} {where}"
+        )
+        lo, hi = ret[0]["lo"], ret[0]["hi"]
+        if lo is None:
+            return [[None, None]]
+
+        if self.split == "minmax" and isinstance(lo, int) and isinstance(hi, int):
+            step = max(-(-(hi - lo + 1) // self.workers), 1)
+            bounds = [lo + i * step for i in range(1, self.workers)]
+            bounds = [bound for bound in bounds if bound <= hi]
+        else:
+            bounds = self._quantiles(pk_v)
+        starts = [lo if pk_v else None] + bounds
+        return [list(bounds) for bounds in zip(starts, bounds + [None])]
 
-    def _extract(self):
-        fields = self.columns + [self.pk]
-        pk_v = self.cache.get(self.cache_key, self.pk)
-        if pk_v:
-            pk_v = self._client.escape(pk_v)
-            sql = (
-                f'SELECT {",".join(fields)} '
-                f"FROM {self.table} "
-                f"WHERE {self.pk} > {pk_v} "
-                f"ORDER BY {self.pk} LIMIT {self.limit}"
+    def _quantiles(self, pk_v=None):
+        """Return the primary keys after ``pk_v`` at every ``1 / workers``
+        quantile, hopping from one to the next along the index by the
+        estimated number of rows per range, so that the index is scanned
+        once at most.
+        """
+        escape = self._client.escape
+        where = self._where(f"{self.pk} > {escape(pk_v)}" if pk_v else None)
+        total = self._explain_rows(where)
+        if not total:
+            ret = self._client.select(
+                f"SELECT COUNT({self.pk}) AS total FROM {self.table} {where}"
+            )
+            total = int(ret[0]["total"])
+        step = max(total // self.workers, 1)
+        bounds = []
+        offset = step
+        for _ in range(1, self.workers):
+            ret = self._client.select(
+                f"SELECT {self.pk} FROM {self.table} {where}"
+                f"ORDER BY {self.pk} LIMIT 1 OFFSET {offset}"
             )
+            if not ret:
+                break
+            bounds.append(ret[0][self.pk])
+            # the next hop starts right after this key
+            where = self._where(f"{self.pk} > {escape(bounds[-1])}")
+            offset = step - 1
+        return bounds
+
+    def sync_range(self, index, start, end):
+        """Push the records which primary key is within [``start``, ``end``),
+        a bound being open if ``None``.
+        """
+        field = f"range.{index}"
+        checkpoint = self.cache.get(self.cache_key, field) or {"count": 0}
+        count, pk_v = checkpoint["count"], checkpoint.get(self.pk)
+        logger.info(
+            f"range {index} [{start}, {end}) continue at "
+            f"{self.pk}: \33[0;32m{pk_v}\33[0m"
+        )
+        if self.streaming:
+            batches = self._stream(pk_v, start, end)
         else:
-            sql = (
-                f'SELECT {",".join(fields)} '
-                f"FROM {self.table} "
-                f"ORDER BY {self.pk} LIMIT {self.limit}"
+            batches = self._pages(pk_v, start, end)
+        for records in self.prefetched(batches):
+            count += len(records)
+            pk_v = records.pk()
+            self.push(
+                records,
+                {field: {"count": count, self.pk: pk_v}},
+                pending_field=self._pending_field(field),
+            )
+            logger.debug(f"range {index}: {len(records)} records pushed")
+        self.log_stats()
+        self._client.close()
+
+    def _pages(self, pk_v=None, start=None, end=None, mark=None):
+        """Yield the records a page at a time, one keyset query per page,
+        until the table or the range [``start``, ``end``) is exhausted.
+        """
+        while True:
+            columns, rows = self._client.select_rows(
+                self._select_sql(pk_v, self.limit, start=start, end=end, mark=mark)
             )
+            if rows:
+                records = self._batch(columns, rows)
+                yield records
+                pk_v, mark = records.pk(), records.mark()
+            if len(rows) < self.limit:
+                return
+
+    def _stream(self, pk_v=None, start=None, end=None, mark=None):
+        """Yield the records of a single unbuffered query, ``limit`` at a
+        time.
+        """
+        batches = self._client.stream(
+            self._select_sql(pk_v, start=start, end=end, mark=mark),
+            self.limit,
+            write_timeout=self.net_write_timeout,
+        )
+        for columns, rows in batches:
+            yield self._batch(columns, rows)
 
-        records = self._client.select(sql)
-        if records:
-            self.cache.set(self.cache_key, "record", records[-1])
-            self.cache.set(self.cache_key, self.pk, records[-1][self.pk])
-        return records
+    def _batch(self, columns, rows):
+        return RowBatch(columns, rows, self.transform, self.pk, self.mark_column)
+
+    def _select_sql(self, pk_v=None, limit=None, start=None, end=None, mark=None):
+        """Build the query of the records after the primary key ``pk_v`` and
+        the watermark ``mark``, or from ``start`` on, and before ``end``, up
+        to ``limit`` of them, or all of them in order if ``None``.
+        """
+        fields = list(self.columns)
+        keys = [self.mark_column, self.pk] if self.mark_column else [self.pk]
+        if fields != ["*"]:
+            fields.extend(key for key in keys if key not in fields)
+        conditions = []
+        if pk_v or mark is not None:
+            conditions.append(self._after(pk_v, mark))
+        elif start is not None:
+            conditions.append(f"{self.pk} >= {self._client.escape(start)}")
+        if end is not None:
+            conditions.append(f"{self.pk} < {self._client.escape(end)}")
+        sql = f'SELECT {",".join(fields)} FROM {self.table} '
+        sql += self._where(*conditions)
+        sql += f'ORDER BY {",".join(keys)}'
+        if limit:
+            sql += f" LIMIT {limit}"
+        return sql
+
+    def _after(self, pk_v, mark=None):
+        """Return the condition of the rows after the primary key ``pk_v``,
+        or after the watermark ``mark`` then ``pk_v`` with a watermark column,
+        ``NULL`` watermarks coming first.
+        """
+        escape = self._client.escape
+        if not self.mark_column:
+            return f"{self.pk} > {escape(pk_v)}" if pk_v else None
+        column = self.mark_column
+        if mark is None:
+            if pk_v is None:
+                return None
+            return f"({column} IS NOT NULL OR {self.pk} > {escape(pk_v)})"
+        return (
+            f"({column} > {escape(mark)} OR "
+            f"({column} = {escape(mark)} AND {self.pk} > {escape(pk_v)}))"
+        )
+
+    def _since(self):
+        """Return the condition of the rows past the watermark the sync
+        started at, ``None`` if not incremental.
+        """
+        return self._after(*self.since) if self.since else None
+
+    def _where(self, *conditions):
+        """Return the ``WHERE`` clause of the ``where`` option of the task and
+        the ``conditions`` which are not ``None``, empty if there are none.
+        """
+        conditions = [f"({self.where})" if self.where else None, *conditions]
+        conditions = [c for c in conditions if c]
+        if not conditions:
+            return ""
+        return f'WHERE {" AND ".join(conditions)} '
 
     def count(self):
-        sql = f"SELECT COUNT({self.pk}) AS total FROM {self.table}"
-        ret = self._client.select(sql)
+        """Count the records matching ``where``, past the watermark of an
+        incremental sync, with the ``total`` strategy:
+        ``estimated`` reads the row count of InnoDB statistics, or the
+        estimate of ``EXPLAIN`` when filtered, ``pk_range`` the span of
+        integer primary keys, and ``exact`` or ``lazy`` runs ``COUNT``.
+        """
+        if self.total_strategy == "estimated":
+            return self._estimated_count()
+        if self.total_strategy == "pk_range":
+            ret = self._client.select(
+                f"SELECT MIN({self.pk}) AS lo, MAX({self.pk}) AS hi "
+                f"FROM {self.table} {self._where(self._since())}"
+            )
+            lo, hi = ret[0]["lo"], ret[0]["hi"]
+            if lo is None:
+                return 0
+            if isinstance(lo, int) and isinstance(hi, int):
+                return hi - lo + 1
+            logger.warning(f"{self.pk} is not an integer, estimate the total")
+            return self._estimated_count()
+        return self._exact_count(self._client)
+
+    def lazy_count(self):
+        client = MySQL.client(provider="mysql", **self.db_config)
+        try:
+            return self._exact_count(client)
+        finally:
+            client.close()
+
+    def _exact_count(self, client):
+        sql = (
+            f"SELECT COUNT({self.pk}) AS total "
+            f"FROM {self.table} {self._where(self._since())}"
+        )
+        ret = client.select(sql)
         return int(ret[0]["total"])
 
-    def filter(self, values):
-        if self.columns == ["*"]:
-            return values
-
-        columns = set(self.columns)
-        return ({k: v for k, v in val.items() if k in columns} for val in values)
-
-    def append(self, values):
-        for v in values:
-            if self.append_db_info:
-                v["porter_db"] = self.db
-                v["porter_table"] = self.table
-            for a in self.appendices:
-                key, val = a.split(":")
-                v[key] = val
-            yield v
-
-    def push(self, values):
-        if values:
-            values = self.append(self.filter(values))
-            self.queue.push(self.queue_key, values)
-
-    def status(self):
-        count = self.cache.get(self.cache_key, "count")
-        page = self.cache.get(self.cache_key, "page")
-        record = self.cache.get(self.cache_key, "record")
-        pk_v = self.cache.get(self.cache_key, self.pk)
-        return {
+    def _estimated_count(self):
+        where = self._where(self._since())
+        if where:
+            return self._explain_rows(where)
+        ret = self._client.select(
+            f"SELECT TABLE_ROWS AS total FROM information_schema.TABLES "
+            f"WHERE TABLE_SCHEMA = {self._client.escape(self.db)} "
+            f"AND TABLE_NAME = {self._client.escape(self.table)}"
+        )
+        return int(ret[0]["total"] or 0) if ret else 0
+
+    def _explain_rows(self, where):
+        """Return the number of rows ``EXPLAIN`` estimates the ``WHERE``
+        clause ``where`` to match.
+        """
+        ret = self._client.select(f"EXPLAIN SELECT {self.pk} FROM {self.table} {where}")
+        return sum(
+            int((r.get("rows") or 0) * (r.get("filtered") or 100) / 100) for r in ret
+        )
+
+    def serialize(self, values):
+        """Encode the tuple rows of a :class:`RowBatch` straight into queue
+        elements, grouped by partition when partitioning by a field.
+        """
+        elements = self.queue.codec.dumps_rows(
+            values.names, values.projected(), values.extra
+        )
+        if self.partitioner is None or self.partitioner.field is None:
+            return elements
+        field = self.partitioner.field
+        records = [{field: value} for value in values.column(field)]
+        return self.partitioner.split(records, elements)
+
+    def format_status(self, checkpoint):
+        status = {
             "db": self.db,
             "table": self.table,
-            "count": count,
-            "page": page,
-            self.pk: pk_v,
-            "record": record,
+            "count": checkpoint.get("count"),
+            "page": checkpoint.get("page"),
+            self.pk: checkpoint.get(self.pk),
+            "record": checkpoint.get("record"),
+            "throttled": checkpoint.get("throttled"),
         }
+        if self.mark_column:
+            status["watermark"] = checkpoint.get("watermark")
+        ranges = checkpoint.get("ranges")
+        if ranges:
+            status["ranges"] = []
+            for field, (start, end) in zip(
+                self._range_fields(ranges), ranges["ranges"]
+            ):
+                progress = checkpoint.get(field) or {"count": 0, self.pk: None}
+                status["ranges"].append(dict(progress, start=start, end=end))
+            status["count"] = ranges["count"] + sum(
+                r["count"] for r in status["ranges"]
+            )
+        return status
@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Transformations of the records read, compiled once per task.
+
+A :class:`Transform` applies, in order, the column projection, the renames,
+the type casts and the constant fields (``appendices`` and database info)
+configured for a task to whole batches of records, either dicts or the
+tuple rows of a query.
+"""
+import datetime
+from decimal import Decimal
+from operator import itemgetter
+
+from porter.exceptions import InvalidConfiguration
+
+
+def _to_bool(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "t", "yes", "y")
+    return bool(value)
+
+
+def _to_datetime(value):
+    if isinstance(value, datetime.datetime):
+        return value
+    return datetime.datetime.fromisoformat(str(value))
+
+
+def _to_date(value):
+    if isinstance(value, datetime.date):
+        return value
+    return datetime.date.fromisoformat(str(value))
+
+
+CASTS = {
+    "int": int,
+    "float": float,
+    "str": str,
+    "bool": _to_bool,
+    "decimal": Decimal,
+    "datetime": _to_datetime,
+    "date": _to_date,
+}
+
+
+def parse_appendices(appendices):
+    """Turn the ``key:value`` strings of ``appendices`` into a dict."""
+    constants = {}
+    for appendix in appendices or ():
+        key, sep, value = appendix.partition(":")
+        if not sep:
+            raise InvalidConfiguration(f"appendix is not key:value: {appendix}")
+        constants[key] = value
+    return constants
+
+
+def _getter(indices):
+    """Return a function picking the items at ``indices`` as a tuple."""
+    if len(indices) == 1:
+        index = indices[0]
+        return lambda row: (row[index],)
+    if not indices:
+        return lambda row: ()
+    return itemgetter(*indices)
+
+
+class Transform:
+    """Projection, renames, casts and constant fields of the records.
+
+    :param columns: fields kept, all of them if empty.
+    :param renames: new names of fields, by old name.
+    :param casts: type of fields, by new name, one of :data:`CASTS`;
+                  ``None`` values are left as they are.
+    :param constants: fields set to the same value in every record, added
+                      last and replacing the fields by the same name.
+    """
+
+    def __init__(self, columns=None, renames=None, casts=None, constants=None):
+        self.columns = [c for c in columns or () if c != "*"]
+        self.renames = dict(renames or {})
+        self.constants = dict(constants or {})
+        try:
+            self.casts = {field: CASTS[name] for field, name in (casts or {}).items()}
+        except KeyError as e:
+            raise InvalidConfiguration(f"unknown cast type: {e.args[0]}")
+        self._apply = self._compile()
+        # projections of tuple rows, by column names
+        self._projections = {}
+
+    @classmethod
+    def from_config(cls, config, constants=None):
+        """Build the transform of the reader section ``config`` of a task,
+        ``constants`` coming before its ``appendices``.
+        """
+        constants = dict(constants or {})
+        constants.update(parse_appendices(config.get("appendices")))
+        return cls(
+            columns=config.get("column"),
+            renames=config.get("rename"),
+            casts=config.get("cast"),
+            constants=constants,
+        )
+
+    def __call__(self, records):
+        """Transform a batch of dict records, modified in place unless
+        projected or renamed, and return them as a list.
+        """
+        return self._apply(records)
+
+    def _compile(self):
+        keep = frozenset(self.columns)
+        columns = list(dict.fromkeys(self.columns))
+        renames = self.renames
+        renamed = {k: renames.get(k, k) for k in columns}
+        casts = list(self.casts.items())
+        constants = self.constants
+        steps = []
+
+        if keep and renames:
+            steps.append(
+                lambda records: [
+                    {renamed[k]: r[k] for k in columns if k in r} for r in records
+                ]
+            )
+        elif keep:
+            steps.append(
+                lambda records: [{k: r[k] for k in columns if k in r} for r in records]
+            )
+        elif renames:
+            steps.append(
+                lambda records: [
+                    {renames.get(k, k): v for k, v in r.items()} for r in records
+                ]
+            )
+
+        if casts:
+
+            def cast(records):
+                for r in records:
+                    for field, to in casts:
+                        value = r.get(field)
+                        if value is not None:
+                            r[field] = to(value)
+                return records
+
+            steps.append(cast)
+
+        if constants:
+
+            def append(records):
+                for r in records:
+                    r.update(constants)
+                return records
+
+            steps.append(append)
+
+        def apply(records):
+            records = records if isinstance(records, list) else list(records)
+            for step in steps:
+                records = step(records)
+            return records
+
+        return apply
+
+    def project_rows(self, columns):
+        """Compile the transform of tuple rows of ``columns``, once per list
+        of columns: returns the names of the fields and a function mapping a
+        row to their values, the ``constants`` being left to the encoder.
+        """
+        key = tuple(columns)
+        projection = self._projections.get(key)
+        if projection is None:
+            projection = self._projections[key] = self._compile_rows(key)
+        return projection
+
+    def _compile_rows(self, columns):
+        keep = frozenset(self.columns)
+        names = []
+        indices = []
+        for index, column in enumerate(columns):
+            name = self.renames.get(column, column)
+            if keep and column not in keep:
+                continue
+            if name in self.constants or name in names:
+                continue
+            names.append(name)
+            indices.append(index)
+
+        getter = _getter(indices)
+        if indices == list(range(len(columns))):
+            getter = None
+        casts = [(i, self.casts[n]) for i, n in enumerate(names) if n in self.casts]
+        if not casts:
+            return names, getter
+
+        def project(row):
+            values = list(row if getter is None else getter(row))
+            for i, to in casts:
+                if values[i] is not None:
+                    values[i] = to(values[i])
+            return values
+
+        return names, project
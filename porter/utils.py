@@ -1,13 +1,142 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import mmap
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 
-from itertools import zip_longest
+COUNT_CHUNK_SIZE = 16 * 1024 * 1024
+READ_BUFFER_SIZE = 4 * 1024 * 1024
 
 
-def batch_read_file(n, f_obj):
-    for n_lines in zip_longest(*[enumerate(f_obj)] * n, fillvalue=None):
-        zips = filter(lambda x: x is not None, n_lines)
-        _, items = zip(*zips)
-        line_num = _[-1] + 1
-        yield line_num, items
+def batch_read_lines(n, f_obj, start=0, end=None, buffer_size=READ_BUFFER_SIZE):
+    """Read the binary file ``f_obj`` in batches of ``n`` lines.
+
+    The file is read ``buffer_size`` bytes at a time, up to the byte offset
+    ``end`` if given, and split on newlines in bulk. Yields the number of lines
+    read so far (counting from ``start``), the byte offset right after the
+    batch and the batch itself, a list of undecoded lines without their
+    trailing newline.
+    """
+    offset = pos = f_obj.tell()
+    line_num = start
+    pending = []
+    tail = b""
+    while True:
+        if end is None:
+            chunk = f_obj.read(buffer_size)
+        else:
+            chunk = f_obj.read(min(buffer_size, end - pos))
+        if not chunk:
+            if tail:
+                pending.append(tail)
+        else:
+            pos += len(chunk)
+            lines = (tail + chunk).split(b"\n")
+            tail = lines.pop()
+            pending.extend(lines)
+
+        index = 0
+        while len(pending) - index >= n or (not chunk and index < len(pending)):
+            batch = pending[index : index + n]
+            index += len(batch)
+            line_num += len(batch)
+            # the last line of a file may lack its newline
+            offset = min(offset + sum(map(len, batch)) + len(batch), pos)
+            yield line_num, offset, batch
+        del pending[:index]
+
+        if not chunk:
+            break
+
+
+def skip_lines(f_obj, n, buffer_size=READ_BUFFER_SIZE):
+    """Move the binary file ``f_obj`` past its next ``n`` lines and return the
+    new byte offset.
+    """
+    while n > 0:
+        pos = f_obj.tell()
+        chunk = f_obj.read(buffer_size)
+        if not chunk:
+            break
+        count = chunk.count(b"\n")
+        if count < n:
+            n -= count
+            continue
+        index = -1
+        for _ in range(n):
+            index = chunk.index(b"\n", index + 1)
+        f_obj.seek(pos + index + 1)
+        n = 0
+    return f_obj.tell()
+
+
+def split_file(path, parts, start=0, end=None):
+    """Split the byte range [``start``, ``end``) of a file into at most
+    ``parts`` ranges whose boundaries fall right after a newline.
+    """
+    if end is None:
+        end = os.path.getsize(path)
+    step = max(-(-(end - start) // parts), 1)
+    bounds = [start]
+    with open(path, "rb") as f_obj:
+        for pos in range(start + step, end, step):
+            if pos <= bounds[-1]:
+                continue
+            f_obj.seek(pos - 1)
+            f_obj.readline()
+            pos = f_obj.tell()
+            if pos >= end:
+                break
+            bounds.append(pos)
+    bounds.append(end)
+    return [(s, e) for s, e in zip(bounds, bounds[1:]) if s < e]
+
+
+def file_fingerprint(path):
+    """Identify the current version of a file by its size, modification time
+    and inode, so a checkpoint taken on it is not applied to a rewritten file.
+    """
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime": stat.st_mtime_ns, "inode": stat.st_ino}
+
+
+def _count_newlines(path, start, end, chunk_size=COUNT_CHUNK_SIZE):
+    count = 0
+    with open(path, "rb") as f_obj:
+        with mmap.mmap(f_obj.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            for pos in range(start, end, chunk_size):
+                count += buf[pos : min(pos + chunk_size, end)].count(b"\n")
+    return count
+
+
+def count_lines(path, workers=1, chunk_size=COUNT_CHUNK_SIZE):
+    """Count the lines of a file by scanning its raw bytes through mmap.
+
+    The file is scanned ``chunk_size`` bytes at a time; with ``workers``
+    greater than 1 it is split into as many byte ranges, counted in a process
+    pool. A last line without trailing newline is counted as well.
+    """
+    size = os.path.getsize(path)
+    if not size:
+        return 0
+
+    if workers > 1 and size > chunk_size:
+        step = -(-size // workers)
+        starts = range(0, size, step)
+        ends = [min(start + step, size) for start in starts]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            count = sum(
+                pool.map(
+                    _count_newlines, repeat(path), starts, ends, repeat(chunk_size)
+                )
+            )
+    else:
+        count = _count_newlines(path, 0, size, chunk_size)
+
+    with open(path, "rb") as f_obj:
+        f_obj.seek(-1, os.SEEK_END)
+        if f_obj.read(1) != b"\n":
+            count += 1
+    return count
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import pytest
+
+from porter import backpressure
+from porter.backpressure import Backpressure
+
+
+class FakeQueue:
+    """Queue which successive lengths follow ``lengths``."""
+
+    def __init__(self, lengths, clock):
+        self.lengths = iter(lengths)
+        self.clock = clock
+        self.signals = []
+
+    def len(self, key):
+        return next(self.lengths)
+
+    def wait_signal(self, key, timeout):
+        self.signals.append(timeout)
+        self.clock.now += timeout
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(backpressure.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(backpressure.time, "sleep", clock.sleep)
+    return clock
+
+
+def controller(clock, lengths, **options):
+    options = dict({"high": 10, "min_interval": 0.01, "max_interval": 10}, **options)
+    return Backpressure(FakeQueue(lengths, clock), "q", **options)
+
+
+class TestBackpressure:
+    def test_low_watermark(self, clock):
+        bp = controller(clock, [5])
+        assert bp.wait() == 0
+        assert clock.sleeps == []
+        assert bp.throttles == 1
+
+    def test_custom_low(self, clock):
+        bp = controller(clock, [8, 3], low=3)
+        assert bp.low == 3
+        bp.wait()
+        assert clock.sleeps == [0.02]
+        # never above high
+        assert controller(clock, [], low=20).low == 10
+
+    def test_doubling(self, clock):
+        bp = controller(clock, [10, 10, 10, 4])
+        waited = bp.wait()
+        assert clock.sleeps == pytest.approx([0.02, 0.04, 0.08])
+        assert waited == pytest.approx(0.14)
+        assert bp.throttled == pytest.approx(0.14)
+
+    def test_max_interval(self, clock):
+        bp = controller(clock, [10] * 5 + [0], max_interval=0.05)
+        bp.wait()
+        assert clock.sleeps == pytest.approx([0.02, 0.04, 0.05, 0.05, 0.05])
+
+    def test_drain_rate(self, clock):
+        bp = controller(clock, [10, 8, 4])
+        bp.wait()
+        # 2 elements drained in 0.02s, 3 more to go down to 5
+        assert clock.sleeps == pytest.approx([0.02, 0.03])
+
+    def test_drain_rate_min_interval(self, clock):
+        bp = controller(clock, [10, 6, 5], min_interval=0.01)
+        bp.wait()
+        # 1 element left at 200/s, shorter than min_interval
+        assert clock.sleeps == pytest.approx([0.02, 0.01])
+
+    def test_stalled_after_drain(self, clock):
+        bp = controller(clock, [10, 8, 8, 0])
+        bp.wait()
+        # back to doubling from the interval of the drain rate
+        assert clock.sleeps == pytest.approx([0.02, 0.03, 0.06])
+
+    def test_wakeup(self, clock):
+        bp = controller(clock, [10, 10, 0], wakeup=True)
+        bp.wait()
+        assert clock.sleeps == []
+        assert bp.queue.signals == pytest.approx([0.02, 0.04])
+
+    def test_stats(self, clock):
+        bp = controller(clock, [10, 0, 10, 0])
+        bp.wait()
+        bp.wait()
+        assert bp.throttles == 2
+        assert bp.throttled == pytest.approx(0.04)
@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import datetime
+import json
+from decimal import Decimal
+
+import pytest
+from bson import ObjectId, json_util
+
+from porter.backends.codecs import JsonCodec, get_codec
+
+RECORD = {
+    "id": 1,
+    "name": "中文",
+    "price": Decimal("12.30"),
+    "created": datetime.datetime(2020, 1, 2, 3, 4, 5, 678000),
+    "blob": b"\x00\xff",
+    "_id": ObjectId("5f0c6e7b9d3e2a1b2c3d4e5f"),
+    "tags": [{"at": datetime.datetime(2021, 6, 1)}],
+}
+
+
+class TestCodecs:
+    @pytest.mark.parametrize("name", ["json", "orjson", "msgpack"])
+    def test_roundtrip(self, name):
+        if name != "json":
+            pytest.importorskip(name)
+        codec = get_codec(name)
+        assert codec.loads(codec.dumps(RECORD)) == RECORD
+        assert codec.loads_many(codec.dumps_many([RECORD, {"id": 2}])) == [
+            RECORD,
+            {"id": 2},
+        ]
+
+    @pytest.mark.parametrize("name", ["json", "orjson", "msgpack"])
+    def test_dumps_rows(self, name):
+        if name != "json":
+            pytest.importorskip(name)
+        codec = get_codec(name)
+        names = list(RECORD)
+        rows = [tuple(RECORD.values()), tuple(range(len(names)))]
+        for extra in (None, {"porter_db": "db", "k": "v"}):
+            records = [dict(zip(names, row), **(extra or {})) for row in rows]
+            assert codec.loads_many(codec.dumps_rows(names, rows, extra)) == records
+
+    def test_json_forms(self):
+        dumped = JsonCodec().dumps({"day": datetime.date(2020, 1, 2), **RECORD})
+        loaded = json_util.loads(dumped)
+        assert loaded["day"] == "2020-01-02"
+        assert loaded["created"] == RECORD["created"]
+        assert loaded["_id"] == RECORD["_id"]
+        assert loaded["price"].to_decimal() == RECORD["price"]
+
+    def test_orjson_same_documents(self):
+        pytest.importorskip("orjson")
+        orjson_doc = json.loads(get_codec("orjson").dumps(RECORD))
+        assert orjson_doc == json.loads(JsonCodec().dumps(RECORD))
+
+    def test_unknown(self):
+        with pytest.raises(ValueError):
+            get_codec("yaml")
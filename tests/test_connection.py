@@ -0,0 +1,32 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from porter.backends.connection import close_pools, pool_stats
+from porter.backends.rediscache import RedisCache
+from porter.backends.redisqueue import RedisQueue
+
+
+class TestConnectionPool:
+    def setup_method(self):
+        close_pools()
+
+    def teardown_method(self):
+        close_pools()
+
+    def test_shared(self):
+        cache = RedisCache(host="localhost", port=6398, key_prefix="cache.")
+        queue = RedisQueue(host="localhost", port=6398, key_prefix="queue.")
+        other = RedisQueue(host="localhost", port=6398, db=1)
+        pool = cache._write_client.connection_pool
+        assert queue._write_client.connection_pool is pool
+        assert other._write_client.connection_pool is not pool
+        endpoints = [stats["endpoint"] for stats in pool_stats()]
+        assert sorted(endpoints) == [
+            "redis://localhost:6398/0",
+            "redis://localhost:6398/1",
+        ]
+
+    def test_unix_socket(self):
+        cache = RedisCache(unix_socket_path="/tmp/redis.sock", max_connections=4)
+        pool = cache._write_client.connection_pool
+        assert pool.connection_kwargs["path"] == "/tmp/redis.sock"
+        assert pool_stats()[0]["max_connections"] == 4
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import io
+
+from porter.csvstream import CsvParser, batch_read_csv, count_csv_records, split_csv
+
+DATA = b'1,plain\n2,"multi\nline, ""quoted"""\n3,"x"\r\n4,last'
+
+
+class TestBatchReadCsv:
+    def test_records(self):
+        batches = list(batch_read_csv(2, io.BytesIO(DATA), buffer_size=4))
+        assert batches == [
+            (1, 8, [b"1,plain"]),
+            (3, 42, [b'2,"multi\nline, ""quoted"""', b'3,"x"']),
+            (4, 48, [b"4,last"]),
+        ]
+
+    def test_resume(self):
+        f_obj = io.BytesIO(DATA)
+        f_obj.seek(8)
+        counts = [count for count, _, _ in batch_read_csv(5, f_obj, start=1)]
+        assert counts == [4]
+
+
+class TestCountCsvRecords:
+    def test_count(self, tmp_path):
+        path = tmp_path / "data.csv"
+        path.write_bytes(DATA)
+        assert count_csv_records(str(path)) == 4
+        assert count_csv_records(str(path), chunk_size=3) == 4
+
+    def test_empty(self, tmp_path):
+        path = tmp_path / "empty.csv"
+        path.write_bytes(b"")
+        assert count_csv_records(str(path)) == 0
+
+
+class TestSplitCsv:
+    def test_split(self, tmp_path):
+        path = tmp_path / "data.csv"
+        path.write_bytes(DATA)
+        # the middle of the file falls within the quotes of the second record
+        assert split_csv(str(path), 2, chunk_size=5) == [(0, 35), (35, 48)]
+
+    def test_records(self, tmp_path):
+        path = tmp_path / "data.csv"
+        path.write_bytes((DATA + b"\n") * 3)
+        for parts in range(1, 8):
+            records = []
+            for start, end in split_csv(str(path), parts):
+                with open(path, "rb") as f_obj:
+                    f_obj.seek(start)
+                    for _, _, batch in batch_read_csv(10, f_obj, end=end):
+                        records.extend(batch)
+            assert len(records) == 12
+
+
+class TestCsvParser:
+    def test_parse(self):
+        records = [
+            record
+            for _, _, batch in batch_read_csv(5, io.BytesIO(DATA))
+            for record in batch
+        ]
+        assert CsvParser().parse_many(records) == [
+            ["1", "plain"],
+            ["2", 'multi\nline, "quoted"'],
+            ["3", "x"],
+            ["4", "last"],
+        ]
+
+    def test_parse_unquoted(self):
+        assert CsvParser(delimiter="\t").parse(b"a\tb") == ["a", "b"]
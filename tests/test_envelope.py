@@ -0,0 +1,30 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import pytest
+
+from porter.backends.codecs import get_codec
+from porter.backends.envelope import Envelope, is_envelope
+
+
+class TestEnvelope:
+    @pytest.mark.parametrize("codec", ["json", "raw"])
+    @pytest.mark.parametrize("compression", [None, "zlib"])
+    def test_roundtrip(self, codec, compression):
+        codec = get_codec(codec)
+        values = [{"id": i} for i in range(7)] if codec.name == "json" else [b"a,b"]
+        envelope = Envelope(codec, records=3, compression=compression)
+        packed = envelope.pack(codec.dumps_many(values))
+        assert len(packed) == -(-len(values) // 3)
+        assert all(is_envelope(data) for data in packed)
+
+        unpacked = []
+        for data in packed:
+            header, batch = Envelope("json").unpack(data)
+            assert header["codec"] == codec.name
+            assert header["compression"] == compression
+            assert header["count"] == len(batch)
+            unpacked.extend(batch)
+        assert unpacked == values
+
+    def test_plain_values(self):
+        assert not is_envelope(get_codec("json").dumps({"id": 1}))
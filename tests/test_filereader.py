@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import json
+
+import pytest
+
+from porter.exceptions import InvalidConfiguration
+from porter.reader import FileReader
+from porter.utils import file_fingerprint
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")
+
+
+@pytest.fixture
+def reader(tmp_path):
+    client = fakeredis.FakeRedis()
+
+    def build(data, limit=2, partitions=None, **file_config):
+        path = tmp_path / "data.csv"
+        path.write_bytes(data)
+        config = {
+            "path": str(path),
+            "delimiter": ",",
+            "header": True,
+            "appendices": [],
+            **file_config,
+        }
+        redis_config = {"host": client, "key": "task", "partitions": partitions}
+        return FileReader(config, redis_config, limit=limit)
+
+    return build
+
+
+def multiline(n):
+    """CSV of ``n`` records, every third one spanning two lines."""
+    rows = [b"id,name"]
+    for i in range(n):
+        rows.append(b'%d,"line\nbreak"' % i if i % 3 == 0 else b"%d,x" % i)
+    return b"\n".join(rows) + b"\n"
+
+
+def pushed(r):
+    return [json.loads(v)["id"] for v in r.queue.range("task", 0, -1)]
+
+
+class TestFileReader:
+    def test_headerless_appendices(self, reader):
+        # plain strings, not key:value pairs, are allowed without header
+        r = reader(b"1,a\n2,b\n3,c\n", header=False, appendices=["X"])
+        r.sync()
+        assert r.queue.range("task", 0, -1) == [b"1,a,X", b"2,b,X", b"3,c,X"]
+
+    def test_header_appendices(self, reader):
+        r = reader(b"id,name\n1,a\n", appendices=["source:csv"])
+        r.sync()
+        assert r.queue.pop("task") == {"id": "1", "name": "a", "source": "csv"}
+
+    def test_resume_offset(self, reader):
+        data = multiline(25)
+        r = reader(data, limit=10)
+        # right after record 9, with the fingerprint of the file
+        offset = data.index(b"\n10,x") + 1
+        fingerprint = file_fingerprint(r.file_path)
+        r.cache.setmany(
+            "task", mapping={"count": 10, "offset": offset, "fingerprint": fingerprint}
+        )
+        r.sync()
+        assert pushed(r) == [str(i) for i in range(10, 25)]
+        assert r.cache.get("task", "count") == 25
+
+    def test_resume_count(self, reader):
+        r = reader(multiline(25), limit=10)
+        r.cache.setmany("task", mapping={"count": 10, "offset": 0})
+        r.sync()
+        assert pushed(r) == [str(i) for i in range(10, 25)]
+
+    def test_resume_changed(self, reader):
+        data = multiline(25)
+        r = reader(data, limit=10)
+        # the offset of another version of the file is not trusted
+        r.cache.setmany(
+            "task", mapping={"count": 10, "offset": 3, "fingerprint": {"size": 0}}
+        )
+        r.sync()
+        assert pushed(r) == [str(i) for i in range(10, 25)]
+
+    def test_resume_lines(self, reader):
+        data = b"".join(b"%d,x\n" % i for i in range(25))
+        r = reader(data, limit=10, header=False)
+        offset = data.index(b"\n10,x") + 1
+        r.cache.setmany(
+            "task",
+            mapping={
+                "count": 10,
+                "offset": offset,
+                "fingerprint": file_fingerprint(r.file_path),
+            },
+        )
+        r.sync()
+        assert r.queue.range("task", 0, -1)[0] == b"10,x"
+        assert r.queue.len("task") == 15
+
+    def test_resume_lines_changed(self, reader):
+        data = b"".join(b"%d,x\n" % i for i in range(25))
+        r = reader(data, limit=10, header=False)
+        r.cache.setmany(
+            "task", mapping={"count": 10, "offset": 3, "fingerprint": {"size": 0}}
+        )
+        r.sync()
+        assert r.queue.range("task", 0, -1)[0] == b"10,x"
+        assert r.queue.len("task") == 15
+
+    def test_headerless_partition_field(self, reader):
+        with pytest.raises(InvalidConfiguration):
+            reader(b"1,a\n", header=False, partitions={"count": 3, "field": "g"})
+        # in turn
+        r = reader(b"1,a\n2,b\n3,c\n", header=False, partitions={"count": 3})
+        r.sync()
+        assert [r.queue.len(key) for key in r.queue_keys] == [1, 1, 1]
@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import io
+import json
+
+import pytest
+
+from porter.exceptions import InvalidJsonDocument
+from porter.jsonstream import JsonArrayScanner, batch_read_json_array
+
+DOCUMENT = json.dumps(
+    {
+        "meta": {"skipped": ["]", {"}": "\\"}]},
+        "data": {"items": [{"i": 0, "s": 'a"]b'}, [1, 2], "x", 3, None]},
+    }
+).encode()
+
+
+class TestJsonArrayScanner:
+    def test_read(self):
+        scanner = JsonArrayScanner(
+            io.BytesIO(DOCUMENT), path="data.items", buffer_size=3
+        )
+        elements = [json.loads(e) for e in scanner.read(10)]
+        assert elements == [{"i": 0, "s": 'a"]b'}, [1, 2], "x", 3, None]
+
+    def test_top_level_array(self):
+        batches = list(batch_read_json_array(2, io.BytesIO(b" [1, {}, [] ] ")))
+        assert batches == [(2, 7, [b"1", b"{}"]), (3, 11, [b"[]"])]
+
+    def test_resume(self):
+        f_obj = io.BytesIO(DOCUMENT)
+        count, offset, _ = next(batch_read_json_array(2, f_obj, path="data.items"))
+        f_obj.seek(offset)
+        batches = list(batch_read_json_array(5, f_obj, start=count, resume=True))
+        assert [(c, [json.loads(e) for e in b]) for c, _, b in batches] == [
+            (5, ["x", 3, None])
+        ]
+
+    def test_skip(self):
+        scanner = JsonArrayScanner(io.BytesIO(DOCUMENT), path="data.items")
+        assert scanner.skip() == 5
+
+    def test_missing_key(self):
+        with pytest.raises(InvalidJsonDocument):
+            JsonArrayScanner(io.BytesIO(DOCUMENT), path="data.missing")
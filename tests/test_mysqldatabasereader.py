@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import pytest
+
+from porter.reader import mysqldatabasereader
+from porter.reader.mysqldatabasereader import MySQLDatabaseReader
+
+
+class FakeClient:
+    def select(self, sql):
+        if "information_schema.TABLES" in sql:
+            return [
+                {"name": "user", "rows": 10, "size": 1024},
+                {"name": "order_2023", "rows": 500, "size": 65536},
+                {"name": "order_2024", "rows": 900, "size": 131072},
+                {"name": "tmp_order", "rows": 1, "size": 16},
+                {"name": "order_item", "rows": 2000, "size": 262144},
+            ]
+        return [
+            {"name": "user", "pk": "id"},
+            {"name": "order_2023", "pk": "order_id"},
+            {"name": "order_2024", "pk": "order_id"},
+            {"name": "tmp_order", "pk": "id"},
+            {"name": "order_item", "pk": "order_id"},
+            {"name": "order_item", "pk": "line"},
+        ]
+
+    def escape(self, value):
+        return f"'{value}'"
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def reader(monkeypatch):
+    monkeypatch.setattr(
+        mysqldatabasereader.MySQL, "client", lambda **kwargs: FakeClient()
+    )
+
+    def build(include=None, exclude=None):
+        db_config = {"db": "shop", "include": include, "exclude": exclude}
+        return MySQLDatabaseReader(db_config, {"key": "shop"})
+
+    return build
+
+
+class TestMySQLDatabaseReader:
+    def test_discover(self, reader):
+        tables = reader().discover()
+        # without single column primary key
+        assert "order_item" not in [t["name"] for t in tables]
+        assert [(t["name"], t["pk"]) for t in tables] == [
+            ("order_2024", "order_id"),
+            ("order_2023", "order_id"),
+            ("user", "id"),
+            ("tmp_order", "id"),
+        ]
+
+    def test_patterns(self, reader):
+        tables = reader(include=["order_*", "user"], exclude=["*_2023"]).discover()
+        assert [t["name"] for t in tables] == ["order_2024", "user"]
+
+    def test_table_key(self, reader):
+        assert reader().table_key({"name": "user"}) == "shop.user"
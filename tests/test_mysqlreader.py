@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import re
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+
+from porter.dbproviders.mysql.base import BaseMySQL
+from porter.reader import mysqlreader
+from porter.reader.mysqlreader import MySQLReader
+
+fakeredis = pytest.importorskip("fakeredis")
+
+
+class FakeClient:
+    """Client of a table which primary keys are ``keys``."""
+
+    escape = staticmethod(BaseMySQL.escape)
+
+    def __init__(self, keys=()):
+        self.keys = sorted(keys)
+        self.queries = []
+
+    def select(self, sql):
+        self.queries.append(sql)
+        after = re.search(r"id > (\d+)", sql)
+        keys = [k for k in self.keys if not after or k > int(after.group(1))]
+        if sql.startswith("EXPLAIN"):
+            return [{"rows": len(keys), "filtered": 100.0}]
+        if "MIN(" in sql:
+            return [{"lo": keys[0], "hi": keys[-1]}] if keys else [{"lo": None}]
+        offset = int(re.search(r"OFFSET (\d+)", sql).group(1))
+        return [{"id": keys[offset]}] if offset < len(keys) else []
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def reader(monkeypatch):
+    def build(keys=(), **options):
+        client = FakeClient(keys)
+        monkeypatch.setattr(mysqlreader.MySQL, "client", lambda **kwargs: client)
+        db_config = {
+            "host": "localhost",
+            "port": 3306,
+            "db": "shop",
+            "user": "root",
+            "password": "",
+            "table": "user",
+            "pk": "id",
+            "column": [],
+            "appendices": [],
+            "append_db_info": False,
+            **options,
+        }
+        return MySQLReader(
+            db_config, {"host": fakeredis.FakeRedis(), "key": "task"}, workers=4
+        )
+
+    return build
+
+
+class TestEscape:
+    def test_values(self):
+        assert BaseMySQL.escape("a'b") == "'a\\'b'"
+        assert BaseMySQL.escape(5) == "5"
+        assert BaseMySQL.escape(None) == "NULL"
+        assert BaseMySQL.escape(Decimal("1.50")) == "1.50"
+        assert BaseMySQL.escape(date(2024, 1, 2)) == "'2024-01-02'"
+        assert BaseMySQL.escape(datetime(2024, 1, 2, 3, 4, 5)) == (
+            "'2024-01-02 03:04:05'"
+        )
+
+
+class TestSelectSql:
+    def test_pk(self, reader):
+        r = reader()
+        assert r._after(None) is None
+        assert r._after("a'b") == "id > 'a\\'b'"
+        assert r._select_sql(5, 10) == (
+            "SELECT * FROM user WHERE id > 5 ORDER BY id LIMIT 10"
+        )
+
+    def test_watermark(self, reader):
+        r = reader(watermark="updated_at")
+        mark = datetime(2024, 1, 2, 3, 4, 5)
+        assert r._select_sql(5, 10, mark=mark) == (
+            "SELECT * FROM user WHERE (updated_at > '2024-01-02 03:04:05' OR "
+            "(updated_at = '2024-01-02 03:04:05' AND id > 5)) "
+            "ORDER BY updated_at,id LIMIT 10"
+        )
+
+    def test_null_watermark(self, reader):
+        r = reader(watermark="updated_at")
+        assert r._after(None) is None
+        assert r._after(5) == "(updated_at IS NOT NULL OR id > 5)"
+
+    def test_watermark_pk(self, reader):
+        r = reader(watermark="id")
+        assert r._select_sql(5, 10) == (
+            "SELECT * FROM user WHERE id > 5 ORDER BY id LIMIT 10"
+        )
+
+    def test_where(self, reader):
+        r = reader(column=["name"], where="deleted = 0", watermark="paid")
+        mark = Decimal("9.90")
+        assert r._select_sql(5, mark=mark) == (
+            "SELECT name,paid,id FROM user WHERE (deleted = 0) AND "
+            "(paid > 9.90 OR (paid = 9.90 AND id > 5)) ORDER BY paid,id"
+        )
+        assert r._select_sql(start=date(2024, 1, 1)) == (
+            "SELECT name,paid,id FROM user WHERE (deleted = 0) AND "
+            "id >= '2024-01-01' ORDER BY paid,id"
+        )
+
+
+class TestSplitRanges:
+    # skewed keys
+    keys = [i * i for i in range(1, 401)]
+
+    def test_quantile(self, reader):
+        r = reader(self.keys, split="quantile")
+        k = self.keys
+        assert r.split_ranges() == [
+            [None, k[100]],
+            [k[100], k[200]],
+            [k[200], k[300]],
+            [k[300], None],
+        ]
+        # hops from one quantile to the next, no count nor long offsets
+        hops = [q for q in r._client.queries if "OFFSET" in q]
+        assert [q.split("OFFSET ")[1] for q in hops] == ["100", "99", "99"]
+        assert not [q for q in r._client.queries if "COUNT" in q]
+
+    def test_quantile_resume(self, reader):
+        r = reader(self.keys, split="quantile")
+        k = self.keys
+        assert r.split_ranges(k[99]) == [
+            [k[100], k[175]],
+            [k[175], k[250]],
+            [k[250], k[325]],
+            [k[325], None],
+        ]
+
+    def test_minmax(self, reader):
+        r = reader(range(1, 101))
+        assert r.split_ranges() == [[None, 26], [26, 51], [51, 76], [76, None]]
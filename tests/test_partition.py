@@ -0,0 +1,22 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from porter.partition import Partitioner
+
+
+class TestPartitioner:
+    def test_keys(self):
+        assert Partitioner(3).keys("task") == ["task.0", "task.1", "task.2"]
+
+    def test_hash_field(self):
+        partitioner = Partitioner(4, field="user")
+        records = [{"user": u, "n": n} for n, u in enumerate("abcabcab")]
+        batches = partitioner.split(records, [r["n"] for r in records])
+        assert sorted(n for batch in batches.values() for n in batch) == list(range(8))
+        for index, batch in batches.items():
+            for n in batch:
+                assert partitioner.index(records[n]) == index
+
+    def test_round_robin(self):
+        partitioner = Partitioner(3)
+        assert partitioner.round_robin([0, 1, 2, 3]) == {0: [0, 3], 1: [1], 2: [2]}
+        assert partitioner.round_robin([4, 5]) == {1: [4], 2: [5]}
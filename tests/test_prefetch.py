@@ -0,0 +1,36 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import pytest
+
+from porter.prefetch import Prefetcher
+
+
+class TestPrefetcher:
+    def test_order(self):
+        batches = Prefetcher(([i] * 3 for i in range(10)), depth=2)
+        assert list(batches) == [[i] * 3 for i in range(10)]
+
+    def test_error(self):
+        def pages():
+            yield 1
+            raise ValueError("broken source")
+
+        batches = iter(Prefetcher(pages()))
+        assert next(batches) == 1
+        with pytest.raises(ValueError):
+            next(batches)
+
+    def test_close_source(self):
+        closed = []
+
+        def pages():
+            try:
+                for i in range(100):
+                    yield i
+            finally:
+                closed.append(True)
+
+        for i in Prefetcher(pages(), depth=4):
+            if i == 2:
+                break
+        assert closed == [True]
@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from decimal import Decimal
+
+import pytest
+
+from porter.exceptions import InvalidConfiguration
+from porter.transform import Transform, parse_appendices
+
+
+class TestTransform:
+    config = {
+        "column": ["id", "name", "price"],
+        "rename": {"name": "title"},
+        "cast": {"id": "int", "price": "decimal"},
+        "appendices": ["source:csv", "url:http://host"],
+    }
+
+    def test_records(self):
+        transform = Transform.from_config(self.config, {"porter_db": "db"})
+        records = transform(
+            iter([{"id": "1", "name": "a", "price": "1.5", "x": 0}, {"id": None}])
+        )
+        constants = {"porter_db": "db", "source": "csv", "url": "http://host"}
+        assert records == [
+            dict(id=1, title="a", price=Decimal("1.5"), **constants),
+            dict(id=None, **constants),
+        ]
+
+    def test_rows(self):
+        transform = Transform.from_config(self.config)
+        names, project = transform.project_rows(["x", "price", "name", "id"])
+        assert names == ["price", "title", "id"]
+        assert project((0, "2", "b", "3")) == [Decimal("2"), "b", 3]
+        assert transform.project_rows(["x", "price", "name", "id"])[1] is project
+
+    def test_rows_unchanged(self):
+        names, project = Transform().project_rows(["id", "name"])
+        assert names == ["id", "name"] and project is None
+
+    def test_invalid(self):
+        with pytest.raises(InvalidConfiguration):
+            Transform(casts={"id": "uuid"})
+        with pytest.raises(InvalidConfiguration):
+            parse_appendices(["novalue"])
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from porter.utils import batch_read_lines, count_lines, skip_lines, split_file
+
+
+class TestCountLines:
+    def test_count(self, tmp_path):
+        path = tmp_path / "lines.txt"
+        path.write_bytes(b"a\nb\nc\n")
+        assert count_lines(str(path)) == 3
+
+    def test_count_without_trailing_newline(self, tmp_path):
+        path = tmp_path / "lines.txt"
+        path.write_bytes(b"a\nb\nc")
+        assert count_lines(str(path)) == 3
+
+    def test_count_empty(self, tmp_path):
+        path = tmp_path / "lines.txt"
+        path.write_bytes(b"")
+        assert count_lines(str(path)) == 0
+
+    def test_count_workers(self, tmp_path):
+        path = tmp_path / "lines.txt"
+        path.write_bytes(b"line\n" * 1000)
+        assert count_lines(str(path), workers=4, chunk_size=64) == 1000
+
+
+class TestBatchReadLines:
+    def test_batches(self, tmp_path):
+        path = tmp_path / "lines.txt"
+        path.write_bytes(b"a\nbb\nccc\ndddd")
+        with open(path, "rb") as f_obj:
+            batches = list(batch_read_lines(2, f_obj, buffer_size=3))
+        assert batches == [
+            (2, 5, [b"a", b"bb"]),
+            (4, 13, [b"ccc", b"dddd"]),
+        ]
+
+    def test_resume(self, tmp_path):
+        path = tmp_path / "lines.txt"
+        path.write_bytes(b"a\nbb\nccc\n")
+        with open(path, "rb") as f_obj:
+            f_obj.seek(2)
+            batches = list(batch_read_lines(5, f_obj, start=1))
+        assert batches == [(3, 9, [b"bb", b"ccc"])]
+
+    def test_end(self, tmp_path):
+        path = tmp_path / "lines.txt"
+        path.write_bytes(b"a\nbb\nccc\n")
+        with open(path, "rb") as f_obj:
+            batches = list(batch_read_lines(5, f_obj, end=5))
+        assert batches == [(2, 5, [b"a", b"bb"])]
+
+
+class TestSkipLines:
+    def test_skip(self, tmp_path):
+        path = tmp_path / "lines.txt"
+        path.write_bytes(b"a\nbb\nccc\n")
+        with open(path, "rb") as f_obj:
+            assert skip_lines(f_obj, 2, buffer_size=2) == 5
+            assert f_obj.read() == b"ccc\n"
+
+
+class TestSplitFile:
+    def test_split(self, tmp_path):
+        path = tmp_path / "lines.txt"
+        path.write_bytes(b"a\nbb\nccc\ndddd\n")
+        assert split_file(str(path), 3) == [(0, 5), (5, 14)]
+
+    def test_split_long_line(self, tmp_path):
+        path = tmp_path / "lines.txt"
+        path.write_bytes(b"aaaaaaaaaa\nb\n")
+        assert split_file(str(path), 4, start=2) == [(2, 11), (11, 13)]